@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import TYPE_CHECKING, Optional
+
+from chess.movegen import (
+    CoordinateMove,
+    can_castle,
+    en_passant_target,
+    in_check,
+    legal_moves,
+)
+from chess.pieces import PieceType
+from chess.utils import Colour, other_colour
+from chess.zobrist import (
+    CASTLING_KEYS,
+    RANDOM64,
+    TURN_OFFSET,
+    en_passant_key,
+    polyglot_key,
+    type_key,
+)
+
+if TYPE_CHECKING:
+    from chess.board import Board, Position
+
+FIFTY_MOVE_PLIES = 100
+MATING_MATERIAL = (PieceType.PAWN, PieceType.ROOK, PieceType.QUEEN)
+
+
+class Termination(StrEnum):
+    CHECKMATE = "checkmate"
+    STALEMATE = "stalemate"
+    FIFTY_MOVES = "the fifty-move rule"
+    THREEFOLD_REPETITION = "threefold repetition"
+    INSUFFICIENT_MATERIAL = "insufficient material"
+    TABLEBASE = "tablebase adjudication"
+    TIME_FORFEIT = "time forfeit"
+
+
+@dataclass
+class Outcome:
+    termination: Termination
+    winner: Optional[Colour] = None
+
+    @property
+    def result(self) -> str:
+        if self.winner is None:
+            return "1/2-1/2"
+        return "1-0" if self.winner == Colour.WHITE else "0-1"
+
+    def __str__(self) -> str:
+        if self.winner is None:
+            return f"Draw by {self.termination}"
+        return f"{self.winner} wins by {self.termination}"
+
+
+class Adjudicator:
+    def __init__(self, board: Board, colour: Colour) -> None:
+        self.colour = colour
+        self.halfmove_clock = 0
+        self.material: Counter[tuple[Colour, PieceType]] = Counter()
+        # Bishops never change square colour, so these only move on captures
+        # and promotions: index 0 counts dark squares and 1 light squares
+        self.bishop_squares = [0, 0]
+        for position, square in board.squares.items():
+            piece = square.piece
+            if piece.type != PieceType.EMPTY and piece.type != PieceType.KING:
+                self._count(piece.type, piece.colour, position, 1)
+
+        self.castling = self._castling_rights(board)
+        self.en_passant = en_passant_target(board, colour)
+        self.en_passant_key = en_passant_key(board, colour)
+        self.keys = [polyglot_key(board, colour)]
+        # Per ply: the clock, castling rights, en passant state and material
+        # changes that update replaced, so that undo can put them back
+        self._undo: list[
+            tuple[
+                int,
+                tuple[bool, ...],
+                Optional[Position],
+                int,
+                list[tuple[PieceType, Colour, Position, int]],
+            ]
+        ] = []
+
+    @staticmethod
+    def _castling_rights(board: Board) -> tuple[bool, ...]:
+        return tuple(
+            can_castle(board, colour, move_category)  # type: ignore[arg-type]
+            for colour, move_category, _ in CASTLING_KEYS
+        )
+
+    def _count(
+        self, piece_type: PieceType, colour: Colour, position: Position, change: int
+    ) -> None:
+        self.material[(colour, piece_type)] += change
+        if piece_type == PieceType.BISHOP:
+            self.bishop_squares[(position[0] + position[1]) % 2] += change
+
+    def update(
+        self,
+        board: Board,
+        move: CoordinateMove,
+        piece_type: PieceType,
+        captured_type: PieceType,
+    ) -> None:
+        colour = self.colour
+        opponent = other_colour(colour)
+        squares = board.squares
+        key = self.keys[-1] ^ RANDOM64[TURN_OFFSET] ^ self.en_passant_key
+        changes: list[tuple[PieceType, Colour, Position, int]] = []
+        self._undo.append(
+            (
+                self.halfmove_clock,
+                self.castling,
+                self.en_passant,
+                self.en_passant_key,
+                changes,
+            )
+        )
+
+        placed = squares[move.destination].piece.type
+        key ^= type_key(piece_type, colour, *move.origin)
+        key ^= type_key(placed, colour, *move.destination)
+        if placed != piece_type:
+            changes.append((piece_type, colour, move.origin, -1))
+            changes.append((placed, colour, move.destination, 1))
+
+        if captured_type != PieceType.EMPTY:
+            captured_at = move.destination
+            if piece_type == PieceType.PAWN and move.destination == self.en_passant:
+                captured_at = (move.destination[0], move.origin[1])
+            key ^= type_key(captured_type, opponent, *captured_at)
+            changes.append((captured_type, opponent, captured_at, -1))
+
+        if (
+            piece_type == PieceType.KING
+            and abs(move.destination[0] - move.origin[0]) == 2
+        ):
+            rank = move.origin[1]
+            short = move.destination[0] == 6
+            key ^= type_key(PieceType.ROOK, colour, 7 if short else 0, rank)
+            key ^= type_key(PieceType.ROOK, colour, 5 if short else 3, rank)
+
+        castling = self._castling_rights(board)
+        for before, after, (_, _, castle_key) in zip(
+            self.castling, castling, CASTLING_KEYS
+        ):
+            if before != after:
+                key ^= castle_key
+        self.castling = castling
+
+        self.en_passant = None
+        self.en_passant_key = 0
+        if (
+            piece_type == PieceType.PAWN
+            and abs(move.destination[1] - move.origin[1]) == 2
+        ):
+            file, rank = move.destination
+            self.en_passant = (file, (move.origin[1] + rank) // 2)
+            self.en_passant_key = en_passant_key(board, opponent)
+        key ^= self.en_passant_key
+
+        for change in changes:
+            self._count(*change)
+        if piece_type == PieceType.PAWN or captured_type != PieceType.EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        self.keys.append(key)
+        self.colour = opponent
+
+    def undo(self) -> None:
+        (
+            self.halfmove_clock,
+            self.castling,
+            self.en_passant,
+            self.en_passant_key,
+            changes,
+        ) = self._undo.pop()
+        for piece_type, colour, position, change in changes:
+            self._count(piece_type, colour, position, -change)
+        self.keys.pop()
+        self.colour = other_colour(self.colour)
+
+    def repetitions(self) -> int:
+        # Only positions since the last capture or pawn move can recur, and
+        # only every other one has the same side to move
+        count = 1
+        key = self.keys[-1]
+        last = len(self.keys) - 1
+        for index in range(last - 2, max(last - self.halfmove_clock, 0) - 1, -2):
+            if self.keys[index] == key:
+                count += 1
+        return count
+
+    def insufficient_material(self) -> bool:
+        material = self.material
+        for colour in (Colour.WHITE, Colour.BLACK):
+            for piece_type in MATING_MATERIAL:
+                if material[(colour, piece_type)]:
+                    return False
+        knights = (
+            material[(Colour.WHITE, PieceType.KNIGHT)]
+            + material[(Colour.BLACK, PieceType.KNIGHT)]
+        )
+        bishops = sum(self.bishop_squares)
+        return knights + bishops <= 1 or (knights == 0 and 0 in self.bishop_squares)
+
+    def outcome(self, board: Board) -> Optional[Outcome]:
+        colour = self.colour
+        if not legal_moves(board, colour):
+            if in_check(board, colour):
+                return Outcome(Termination.CHECKMATE, other_colour(colour))
+            return Outcome(Termination.STALEMATE)
+        if self.insufficient_material():
+            return Outcome(Termination.INSUFFICIENT_MATERIAL)
+        if self.halfmove_clock >= FIFTY_MOVE_PLIES:
+            return Outcome(Termination.FIFTY_MOVES)
+        if self.repetitions() >= 3:
+            return Outcome(Termination.THREEFOLD_REPETITION)
+        return None
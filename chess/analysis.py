@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.pool import AsyncResult
+from typing import Iterable, Iterator, Optional, TextIO
+
+from chess.board import STARTING_FEN, Board
+from chess.epd import board_from_fen, board_to_fen, format_operations, parse_epd
+from chess.exceptions import NotationError
+from chess.movegen import make_move, parse_san, san
+from chess.pgn import read_games
+from chess.search import MATE_BOUND, MATE_SCORE, Searcher
+from chess.utils import Colour, other_colour
+from chess.workers import current_worker, start_worker
+
+
+@dataclass
+class AnalysisTask:
+    label: str
+    fen: str
+
+
+@dataclass
+class AnalysisResult:
+    label: str
+    fen: str
+    best_move: Optional[str]
+    score: int
+    depth: int
+    nodes: int
+
+    def epd(self) -> str:
+        operations: dict[str, list[str]] = {}
+        if self.best_move is not None:
+            operations["bm"] = [self.best_move]
+        if abs(self.score) >= MATE_BOUND:
+            moves = (MATE_SCORE - abs(self.score) + 1) // 2
+            operations["dm"] = [str(moves if self.score > 0 else -moves)]
+        else:
+            operations["ce"] = [str(self.score)]
+        operations["acd"] = [str(self.depth)]
+        operations["acn"] = [str(self.nodes)]
+        operations["id"] = [self.label]
+        return self.fen + format_operations(operations)
+
+
+@dataclass
+class AnalysisStats:
+    positions: int = 0
+    nodes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def positions_per_second(self) -> float:
+        return self.positions / self.seconds if self.seconds else 0.0
+
+
+def positions_from_pgn(path: str) -> Iterator[AnalysisTask]:
+    with open(path) as stream:
+        for number, game in enumerate(read_games(stream), 1):
+            if "FEN" in game.headers:
+                board, colour = board_from_fen(game.headers["FEN"])
+            else:
+                board, colour = Board.from_fen(STARTING_FEN), Colour.WHITE
+            for ply, text in enumerate(game.moves):
+                yield AnalysisTask(
+                    f"{path}:{number}:{ply}", board_to_fen(board, colour)
+                )
+                try:
+                    move = parse_san(board, text, colour)
+                except NotationError:
+                    break
+                make_move(board, move)
+                colour = other_colour(colour)
+            else:
+                # The position the game ended in is analysed as well
+                yield AnalysisTask(
+                    f"{path}:{number}:{len(game.moves)}", board_to_fen(board, colour)
+                )
+
+
+def positions_from_epd(path: str) -> Iterator[AnalysisTask]:
+    with open(path) as stream:
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            label = parse_epd(line).id or f"{path}:{number}"
+            yield AnalysisTask(label, " ".join(line.split()[:4]))
+
+
+def positions_from_files(paths: Iterable[str]) -> Iterator[AnalysisTask]:
+    for path in paths:
+        if path.lower().endswith(".pgn"):
+            yield from positions_from_pgn(path)
+        else:
+            yield from positions_from_epd(path)
+
+
+def analyse(searcher: Searcher, task: AnalysisTask, depth: int) -> AnalysisResult:
+    board, colour = board_from_fen(task.fen)
+    result = searcher.search(board, colour, depth)
+    best_move = None if result.move is None else san(board, result.move, colour)
+    return AnalysisResult(
+        task.label, task.fen, best_move, result.score, result.depth, result.nodes
+    )
+
+
+def analyse_chunk(tasks: list[AnalysisTask]) -> list[AnalysisResult]:
+    worker = current_worker()
+    return [analyse(worker.searcher, task, worker.settings["depth"]) for task in tasks]
+
+
+def chunked(tasks: Iterable[AnalysisTask], size: int) -> Iterator[list[AnalysisTask]]:
+    iterator = iter(tasks)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def analyse_positions(
+    tasks: Iterable[AnalysisTask],
+    workers: int = 1,
+    depth: int = 3,
+    chunk_size: int = 16,
+    hash_size: int = 1 << 16,
+    tablebases: Optional[str] = None,
+) -> Iterator[AnalysisResult]:
+    initargs = ({"hash_size": hash_size}, {"depth": depth}, tablebases)
+    if workers <= 1:
+        start_worker(*initargs)
+        for chunk in chunked(tasks, chunk_size):
+            yield from analyse_chunk(chunk)
+        return
+
+    # Pool.imap would read the whole input up front, so chunks are submitted
+    # by hand with at most two per worker in flight, and collected in order
+    with multiprocessing.Pool(
+        workers, initializer=start_worker, initargs=initargs
+    ) as pool:
+        pending: deque[AsyncResult[list[AnalysisResult]]] = deque()
+        for chunk in chunked(tasks, chunk_size):
+            pending.append(pool.apply_async(analyse_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def run(
+    tasks: Iterable[AnalysisTask],
+    output: Optional[TextIO],
+    **options: object,
+) -> AnalysisStats:
+    stats = AnalysisStats()
+    start = time.perf_counter()
+    for result in analyse_positions(tasks, **options):  # type: ignore[arg-type]
+        stats.positions += 1
+        stats.nodes += result.nodes
+        if output is not None:
+            output.write(result.epd() + "\n")
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.analysis",
+        description="Search every position in PGN and EPD files",
+    )
+    parser.add_argument("files", nargs="+", help="PGN (.pgn) or EPD files")
+    parser.add_argument("-o", "--output", help="write annotated EPD here")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument(
+        "--hash-size", type=int, default=1 << 16, help="hash entries per worker"
+    )
+    parser.add_argument("--tablebases", help="directory of endgame tablebases")
+    parser.add_argument("--limit", type=int, help="only analyse this many positions")
+    parser.add_argument(
+        "--scaling",
+        help="comma separated worker counts to time on the same positions",
+    )
+    args = parser.parse_args()
+
+    options = {
+        "depth": args.depth,
+        "chunk_size": args.chunk_size,
+        "hash_size": args.hash_size,
+        "tablebases": args.tablebases,
+    }
+
+    def tasks() -> Iterator[AnalysisTask]:
+        return itertools.islice(positions_from_files(args.files), args.limit)
+
+    if args.scaling:
+        baseline = 0.0
+        print(
+            f"{'workers':>7} {'positions':>9} {'seconds':>8} {'pos/s':>8} {'speedup':>7}"
+        )
+        for workers in (int(count) for count in args.scaling.split(",")):
+            stats = run(tasks(), None, workers=workers, **options)
+            baseline = baseline or stats.positions_per_second
+            print(
+                f"{workers:7} {stats.positions:9} {stats.seconds:8.2f} "
+                f"{stats.positions_per_second:8.1f} "
+                f"{stats.positions_per_second / baseline:7.2f}"
+            )
+        return
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        stats = run(tasks(), output, workers=args.workers, **options)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(
+        f"{stats.positions} positions in {stats.seconds:.1f}s "
+        f"({stats.positions_per_second:.1f} positions/s, "
+        f"{stats.nodes / stats.seconds if stats.seconds else 0:.0f} nodes/s, "
+        f"{args.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import pickle
+import struct
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.pool import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from chess.analysis import positions_from_files
+from chess.board import Board
+from chess.epd import board_from_fen
+from chess.journal import decode_board, decode_move, encode_board, encode_move
+from chess.search import SearchResult
+from chess.utils import Colour
+from chess.workers import attach_memory, current_worker, start_worker
+
+HEADER = struct.Struct(">II")
+# Side to move, square of the last piece moved, then a byte per square for the
+# piece and for its move count, laid out as in the journal checkpoints
+POSITION = struct.Struct(">BB64s64s")
+RESULT = struct.Struct(">HiBI")
+NO_MOVE = 0
+
+
+class PositionBatch:
+    # Positions and their search results in one shared memory block, so that
+    # worker processes are only sent its name and a range of indices
+    def __init__(self, memory: SharedMemory, owner: bool) -> None:
+        self.memory = memory
+        self.owner = owner
+        self.buffer = memory.buf
+        self.capacity, _ = HEADER.unpack_from(self.buffer)
+        self.results_offset = HEADER.size + self.capacity * POSITION.size
+
+    @classmethod
+    def create(cls, capacity: int) -> PositionBatch:
+        memory = SharedMemory(
+            create=True,
+            size=HEADER.size + capacity * (POSITION.size + RESULT.size),
+        )
+        HEADER.pack_into(memory.buf, 0, capacity, 0)
+        return cls(memory, True)
+
+    @classmethod
+    def attach(cls, name: str) -> PositionBatch:
+        return cls(attach_memory(name), False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def __len__(self) -> int:
+        return HEADER.unpack_from(self.buffer)[1]
+
+    def append(self, board: Board, colour: Colour) -> int:
+        index = len(self)
+        if index == self.capacity:
+            raise IndexError("The position batch is full")
+        pieces, moves_made, last_moved = encode_board(board)
+        POSITION.pack_into(
+            self.buffer,
+            HEADER.size + index * POSITION.size,
+            colour == Colour.BLACK,
+            last_moved,
+            pieces,
+            moves_made,
+        )
+        HEADER.pack_into(self.buffer, 0, self.capacity, index + 1)
+        return index
+
+    def position(self, index: int) -> tuple[Board, Colour]:
+        offset = HEADER.size + index * POSITION.size
+        # The board is decoded straight from slices of the shared buffer
+        board = decode_board(
+            self.buffer[offset + 2 : offset + 66],
+            self.buffer[offset + 66 : offset + 130],
+            self.buffer[offset + 1],
+        )
+        return board, Colour.BLACK if self.buffer[offset] else Colour.WHITE
+
+    def set_result(self, index: int, result: SearchResult) -> None:
+        RESULT.pack_into(
+            self.buffer,
+            self.results_offset + index * RESULT.size,
+            NO_MOVE if result.move is None else encode_move(result.move),
+            result.score,
+            result.depth,
+            result.nodes,
+        )
+
+    def result(self, index: int) -> SearchResult:
+        code, score, depth, nodes = RESULT.unpack_from(
+            self.buffer, self.results_offset + index * RESULT.size
+        )
+        return SearchResult(
+            None if code == NO_MOVE else decode_move(code), score, depth, nodes
+        )
+
+    def close(self) -> None:
+        self.buffer = None  # type: ignore[assignment]
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self) -> PositionBatch:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def search_batch(name: str, start: int, stop: int) -> None:
+    worker = current_worker()
+    batch = PositionBatch.attach(name)
+    try:
+        for index in range(start, stop):
+            board, colour = batch.position(index)
+            batch.set_result(
+                index, worker.searcher.search(board, colour, worker.settings["depth"])
+            )
+    finally:
+        batch.close()
+
+
+def search_board(board: Board, colour: Colour) -> SearchResult:
+    worker = current_worker()
+    return worker.searcher.search(board, colour, worker.settings["depth"])
+
+
+def search_shared(
+    pool: Pool,
+    positions: list[tuple[Board, Colour]],
+    chunk_size: int,
+) -> list[SearchResult]:
+    with PositionBatch.create(len(positions)) as batch:
+        for board, colour in positions:
+            batch.append(board, colour)
+        pool.starmap(
+            search_batch,
+            [
+                (batch.name, start, min(start + chunk_size, len(positions)))
+                for start in range(0, len(positions), chunk_size)
+            ],
+        )
+        return [batch.result(index) for index in range(len(batch))]
+
+
+def search_pickled(
+    pool: Pool,
+    positions: list[tuple[Board, Colour]],
+    chunk_size: int,
+) -> list[SearchResult]:
+    return pool.starmap(search_board, positions, chunksize=chunk_size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.batch",
+        description="Compare sending positions to workers through shared memory "
+        "with pickling the boards",
+    )
+    parser.add_argument("files", nargs="+", help="PGN (.pgn) or EPD files")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--depth", type=int, default=0, help="0 measures the transfer on its own"
+    )
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--hash-size", type=int, default=1 << 12)
+    parser.add_argument("--limit", type=int, help="only use this many positions")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    positions = [
+        board_from_fen(task.fen)
+        for task in itertools.islice(positions_from_files(args.files), args.limit)
+    ]
+    pickled_size = sum(len(pickle.dumps(position)) for position in positions)
+    print(
+        f"{len(positions)} positions: {pickled_size / len(positions):.0f} bytes "
+        f"pickled, {POSITION.size + RESULT.size} bytes in shared memory per position"
+    )
+
+    # The workers attach the position batches through this process's
+    # resource tracker, so it has to be running before they start
+    resource_tracker.ensure_running()
+    with multiprocessing.Pool(
+        args.workers,
+        initializer=start_worker,
+        initargs=({"hash_size": args.hash_size}, {"depth": args.depth}),
+    ) as pool:
+        for name, method in (("pickled", search_pickled), ("shared", search_shared)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                method(pool, positions, args.chunk_size)
+                best = min(best, time.perf_counter() - start)
+            print(f"{name:8} {best:8.3f}s {len(positions) / best:10.1f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,576 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from chess.board import STARTING_FEN, Board
+from chess.engine import EnginePlayer
+from chess.epd import board_from_fen
+from chess.move import Move
+from chess.movegen import legal_moves, make_move, perft
+from chess.pieces import PieceType
+from chess.players import Player
+from chess.search import MAX_DEPTH, SearchResult, Searcher
+from chess.square import Square
+from chess.suite import read_suite, run_suite
+from chess.ui import CLI
+from chess.utils import Colour, MoveCategory, other_colour, position_map
+from chess.zobrist import START_KEY, polyglot_key
+
+# Positions use this game's FEN layout: rank 1 first, lower case for White
+OPEN_GAME_FEN = "rnbqk2r/pppp1ppp/5n2/2b1p3/4P3/2N2N2/PPPP1PPP/R1BQKB1R"
+FOOLS_MATE_FEN = "rnbqkbnr/ppppp2p/5p2/6pQ/4P3/8/PPPP1PPP/RNB1KBNR"
+BISHOP_CHECK_FEN = "rnbqk1nr/pppp1ppp/8/4p3/1b2P3/3P4/PPP2PPP/RNBQKBNR"
+
+SAN_CORPUS = (
+    "e4",
+    "d3",
+    "Nf3",
+    "Bxc4",
+    "Qa4",
+    "exd5",
+    "Nbd2",
+    "R1e1",
+    "0-0",
+    "0-0-0",
+    "e8=q",
+)
+
+ORIGIN_SEARCHES: dict[PieceType, str] = {
+    PieceType.PAWN: "d3",
+    PieceType.KNIGHT: "g5",
+    PieceType.BISHOP: "b5",
+    PieceType.ROOK: "g1",
+    PieceType.QUEEN: "e2",
+    PieceType.KING: "f1",
+}
+
+# Standard FEN positions searched by --selective, and by chess.smp when it
+# is given none: middlegames, the opening,
+# a back rank mate and endings with zugzwang, where null moves can mislead
+SEARCH_POSITIONS = (
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ -",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - -",
+    "8/8/p1p5/1p5p/1P5p/8/PPP2K1p/4R1rk w - -",
+    "8/k7/3p4/p2P1p2/P2P1P2/8/8/K7 w - -",
+)
+
+# Standard FEN positions with their known perft counts, which any change to
+# move generation or make/unmake must reproduce exactly
+PERFT_POSITIONS: dict[str, tuple[str, int, int]] = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -", 3, 8902),
+    "kiwipete": (
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq -",
+        3,
+        97862,
+    ),
+    "position 3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -", 4, 43238),
+    "position 4": (
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq -",
+        3,
+        9467,
+    ),
+    "position 5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ -", 2, 1486),
+}
+
+# Cold import budgets in seconds for the entry points that should stay lean,
+# and modules that must not be pulled in by them
+STARTUP_BUDGETS: dict[str, float] = {
+    "chess.board": 0.08,
+    "chess.movegen": 0.06,
+    "chess.search": 0.10,
+    "chess.selfplay": 0.15,
+    "main": 0.15,
+}
+HEAVY_MODULES = ("pydantic", "chess.move")
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], Callable[[], object]]
+
+
+def _square(board: Board, name: str) -> Square:
+    return board.get_square(*position_map[(name[0], name[1])])
+
+
+def _find_origin(piece_type: PieceType) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        board = Board.from_fen(OPEN_GAME_FEN)
+        destination = _square(board, ORIGIN_SEARCHES[piece_type])
+        return lambda: board.find_origin_squares(
+            piece_type, destination, MoveCategory.REGULAR, Colour.WHITE
+        )
+
+    return setup
+
+
+def _from_fen() -> Callable[[], object]:
+    return lambda: Board.from_fen(OPEN_GAME_FEN)
+
+
+def _king_is_in_check() -> Callable[[], object]:
+    board = Board.from_fen(OPEN_GAME_FEN)
+    return lambda: board.king_is_in_check(Colour.WHITE)
+
+
+def _checkmate(fen: str, colour: Colour) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        board = Board.from_fen(fen)
+        return lambda: board.check_for_checkmate(colour)
+
+    return setup
+
+
+def _legal_moves(fen: str, colour: Colour) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        board = Board.from_fen(fen)
+        return lambda: legal_moves(board, colour)
+
+    return setup
+
+
+def _perft(fen: str, depth: int) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        board, colour = board_from_fen(fen)
+        return lambda: perft(board, colour, depth)
+
+    return setup
+
+
+def _parse_move() -> Callable[[], object]:
+    board = Board.from_fen(STARTING_FEN)
+    player = Player("Bench", 0, Colour.WHITE)
+
+    def parse_corpus() -> None:
+        for move in SAN_CORPUS:
+            CLI.parse_move(move, board, player)
+
+    return parse_corpus
+
+
+def _move_construction() -> Callable[[], object]:
+    board = Board.from_fen(STARTING_FEN)
+    player = Player("Bench", 0, Colour.WHITE)
+    destination = _square(board, "e4")
+    return lambda: Move(
+        player=player,
+        piece_type=PieceType.PAWN,
+        destination=destination,
+        move_category=MoveCategory.REGULAR,
+    )
+
+
+def _board_string() -> Callable[[], object]:
+    board = Board.from_fen(OPEN_GAME_FEN)
+    return lambda: board.board_string(Colour.WHITE)
+
+
+BENCHMARKS: list[Benchmark] = [
+    Benchmark("Board.from_fen", _from_fen),
+    *(
+        Benchmark(f"find_origin_squares[{piece_type.value}]", _find_origin(piece_type))
+        for piece_type in ORIGIN_SEARCHES
+    ),
+    Benchmark("king_is_in_check", _king_is_in_check),
+    Benchmark("check_for_checkmate[mate]", _checkmate(FOOLS_MATE_FEN, Colour.WHITE)),
+    Benchmark("check_for_checkmate[check]", _checkmate(BISHOP_CHECK_FEN, Colour.BLACK)),
+    Benchmark("legal_moves[open game]", _legal_moves(OPEN_GAME_FEN, Colour.WHITE)),
+    Benchmark("legal_moves[check]", _legal_moves(BISHOP_CHECK_FEN, Colour.BLACK)),
+    Benchmark("perft[kiwipete d2]", _perft(PERFT_POSITIONS["kiwipete"][0], 2)),
+    Benchmark("CLI.parse_move[corpus]", _parse_move),
+    Benchmark("Move construction", _move_construction),
+    Benchmark("board_string", _board_string),
+]
+
+
+def run_benchmark(
+    benchmark: Benchmark, repeat: int = 5, min_time: float = 0.2
+) -> dict[str, float]:
+    timer = timeit.Timer(benchmark.setup())
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    timings = timer.repeat(repeat=repeat, number=number)
+    return {"seconds_per_call": min(timings) / number, "number": number}
+
+
+def run_all(
+    selected: str = "", repeat: int = 5, min_time: float = 0.2
+) -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {
+            benchmark.name: run_benchmark(benchmark, repeat, min_time)
+            for benchmark in BENCHMARKS
+            if selected in benchmark.name
+        },
+    }
+
+
+def import_time(module: str) -> tuple[float, list[str]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = 0.0
+    imported = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        imported.append(name.strip())
+        if name.strip() == module:
+            seconds = int(cumulative) / 1e6
+    return seconds, imported
+
+
+def run_startup(repeat: int = 5) -> dict[str, dict[str, Any]]:
+    results = {}
+    for module, budget in STARTUP_BUDGETS.items():
+        timings = []
+        for _ in range(repeat):
+            seconds, imported = import_time(module)
+            timings.append(seconds)
+        results[module] = {
+            "seconds": min(timings),
+            "budget": budget,
+            "heavy_imports": [name for name in HEAVY_MODULES if name in imported],
+        }
+    return results
+
+
+def run_checks() -> dict[str, tuple[int, int]]:
+    # Exact values the engine must keep producing however it is optimised,
+    # as (expected, actual)
+    board = Board.from_fen(STARTING_FEN)
+    checks = {"polyglot start key": (START_KEY, polyglot_key(board, Colour.WHITE))}
+    for name, (fen, depth, expected) in PERFT_POSITIONS.items():
+        position, colour = board_from_fen(fen)
+        checks[f"perft {name} d{depth}"] = (expected, perft(position, colour, depth))
+    return checks
+
+
+QUIESCENCE_CONFIGS: dict[str, dict[str, bool]] = {
+    "no quiescence": {"quiescence": False},
+    "quiescence": {"quiescence": True, "see_pruning": False},
+    "quiescence + SEE": {"quiescence": True, "see_pruning": True},
+}
+
+
+def run_tactics(path: str, depth: int) -> dict[str, dict[str, Any]]:
+    # Solved through chess.suite, searching to a fixed depth with no time limit
+    positions = list(read_suite(path))
+    results = {}
+    for name, options in QUIESCENCE_CONFIGS.items():
+        solved = run_suite(positions, math.inf, max_depth=depth, options=options)
+        results[name] = {
+            "solved": sum(result.solved for result in solved),
+            "positions": len(solved),
+            "nodes": sum(result.nodes for result in solved),
+            "quiescence_nodes": sum(result.quiescence_nodes for result in solved),
+            "see_pruned": sum(result.see_pruned for result in solved),
+            "seconds": sum(result.seconds for result in solved),
+        }
+    return results
+
+
+SELECTIVE_CONFIGS: dict[str, dict[str, bool]] = {
+    "alpha-beta": {"null_move": False, "late_move_reductions": False},
+    "null move": {"null_move": True, "late_move_reductions": False},
+    "LMR": {"null_move": False, "late_move_reductions": True},
+    "null move + LMR": {"null_move": True, "late_move_reductions": True},
+}
+
+
+def run_selective(seconds: float, depth: int) -> dict[str, dict[str, Any]]:
+    # Each position is searched for a fixed time, recording the depth it
+    # completed and when it completed the given depth
+    results = {}
+    for name, options in SELECTIVE_CONFIGS.items():
+        totals: dict[str, Any] = {
+            "depths": [],
+            "time_to_depth": [],
+            "nodes": 0,
+            "null_cutoffs": 0,
+            "reductions": 0,
+            "re_searches": 0,
+        }
+        for fen in SEARCH_POSITIONS:
+            board, colour = board_from_fen(fen)
+            searcher = Searcher(**options)  # type: ignore[arg-type]
+            start = time.monotonic()
+            reached: list[float] = []
+
+            def info(result: SearchResult) -> None:
+                if result.depth == depth:
+                    reached.append(time.monotonic() - start)
+
+            result = searcher.search(
+                board, colour, MAX_DEPTH, deadline=start + seconds, info=info
+            )
+            totals["depths"].append(result.depth)
+            totals["time_to_depth"].append(reached[0] if reached else None)
+            for counter in ("nodes", "null_cutoffs", "reductions", "re_searches"):
+                totals[counter] += getattr(searcher, counter)
+        results[name] = totals
+    return results
+
+
+def run_pawn_hash(depth: int) -> dict[str, dict[str, Any]]:
+    # Every position is searched to the same depth with and without a pawn
+    # table; the searches are identical but for the time spent on pawns
+    results = {}
+    for name, size in (("no pawn table", 0), ("pawn table", 1 << 14)):
+        totals: dict[str, Any] = {"seconds": 0.0, "nodes": 0}
+        for fen in SEARCH_POSITIONS:
+            board, colour = board_from_fen(fen)
+            searcher = Searcher(pawn_hash_size=size)
+            start = time.perf_counter()
+            searcher.search(board, colour, depth)
+            totals["seconds"] += time.perf_counter() - start
+            totals["nodes"] += searcher.nodes
+            if searcher.pawn_table is not None:
+                for key, value in searcher.pawn_table.stats().items():
+                    totals[key] = totals.get(key, 0) + value
+        if "probes" in totals:
+            totals["hit_rate"] = totals["hits"] / max(totals["probes"], 1)
+        results[name] = totals
+    return results
+
+
+def run_ponder(
+    think: float, moves: int = 10, depth: int = 3
+) -> dict[str, dict[str, Any]]:
+    # The opponent is a second searcher that picks its reply straight away
+    # and then waits think seconds, as a human would, before playing it
+    results = {}
+    for ponder in (False, True):
+        board = Board.from_fen(STARTING_FEN)
+        engine = EnginePlayer("Engine", 0, Colour.WHITE, depth=depth, ponder=ponder)
+        opponent = Searcher()
+        latencies = []
+        for _ in range(moves):
+            start = time.perf_counter()
+            move = engine.choose_move(board)
+            latencies.append(time.perf_counter() - start)
+            make_move(board, move)
+            reply = opponent.search(board, other_colour(engine.colour), depth).move
+            if reply is None:
+                break
+            if ponder:
+                engine.start_pondering(board)
+            time.sleep(think)
+            make_move(board, reply)
+        engine.stop_pondering()
+        results["ponder" if ponder else "no ponder"] = {
+            "moves": len(latencies),
+            "mean_latency": sum(latencies) / len(latencies),
+            "max_latency": max(latencies),
+            "hits": engine.ponder_hits,
+            "misses": engine.ponder_misses,
+        }
+    return results
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any]
+) -> list[tuple[str, float, float, float]]:
+    rows = []
+    for name, result in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+        ratio = result["seconds_per_call"] / previous["seconds_per_call"]
+        rows.append(
+            (name, previous["seconds_per_call"], result["seconds_per_call"], ratio)
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.benchmark", description="Board microbenchmarks"
+    )
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="compare with a saved result file")
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed slowdown against the baseline (0.10 is 10%%)",
+    )
+    parser.add_argument("-k", "--select", default="", help="only run matching names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="check cold import times against their budgets instead",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="check values the engine must reproduce exactly instead",
+    )
+    parser.add_argument(
+        "--tactics",
+        metavar="EPD",
+        help="compare quiescence and SEE pruning on a tactical EPD suite instead",
+    )
+    parser.add_argument(
+        "--ponder",
+        type=float,
+        metavar="SECONDS",
+        help="time engine replies with and without pondering instead, against "
+        "an opponent that thinks for this long",
+    )
+    parser.add_argument(
+        "--selective",
+        type=float,
+        metavar="SECONDS",
+        help="compare null-move pruning and late-move reductions instead, by the "
+        "depth reached in this many seconds per position",
+    )
+    parser.add_argument(
+        "--pawn-hash",
+        action="store_true",
+        help="time searches with and without the pawn structure table instead",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=3,
+        help="depth for --tactics, --ponder and --pawn-hash, and to time with "
+        "--selective",
+    )
+    args = parser.parse_args()
+
+    if args.selective is not None:
+        results = run_selective(args.selective, args.depth)
+        for name, result in results.items():
+            depths = result["depths"]
+            timed = [seconds for seconds in result["time_to_depth"] if seconds]
+            print(
+                f"{name:16} depth in {args.selective:g}s: "
+                f"{' '.join(f'{depth:2}' for depth in depths)} "
+                f"(mean {sum(depths) / len(depths):4.1f}), depth {args.depth} "
+                f"in {sum(timed) / max(len(timed), 1):5.2f}s on "
+                f"{len(timed)}/{len(depths)}; {result['null_cutoffs']} null "
+                f"cutoffs, {result['reductions']} reductions, "
+                f"{result['re_searches']} re-searches"
+            )
+        return
+
+    if args.pawn_hash:
+        for name, result in run_pawn_hash(args.depth).items():
+            line = f"{name:14} {result['nodes']:10} nodes {result['seconds']:8.2f}s"
+            if "probes" in result:
+                line += (
+                    f"; {result['hit_rate']:.1%} of {result['probes']} probes hit, "
+                    f"{result['compute_time']:.3f}s computing pawns, "
+                    f"{result['saved_time']:.3f}s saved"
+                )
+            print(line)
+        return
+
+    if args.ponder is not None:
+        for name, result in run_ponder(args.ponder, depth=args.depth).items():
+            print(
+                f"{name:10} {result['moves']:3} moves "
+                f"mean {result['mean_latency'] * 1e3:8.1f} ms "
+                f"max {result['max_latency'] * 1e3:8.1f} ms "
+                f"({result['hits']} ponder hits, {result['misses']} misses)"
+            )
+        return
+
+    if args.tactics:
+        for name, result in run_tactics(args.tactics, args.depth).items():
+            print(
+                f"{name:18} solved {result['solved']:3}/{result['positions']:<3} "
+                f"{result['nodes']:10} nodes {result['quiescence_nodes']:10} in "
+                f"quiescence {result['see_pruned']:8} SEE pruned "
+                f"{result['seconds']:8.2f}s"
+            )
+        return
+
+    if args.check:
+        failures = 0
+        for name, (expected, actual) in run_checks().items():
+            show = hex if name.endswith("key") else str
+            flag = "ok"
+            if actual != expected:
+                failures += 1
+                flag = f"FAILED, expected {show(expected)}"
+            print(f"{name:24} {show(actual)} {flag}")
+        if failures:
+            sys.exit(1)
+        return
+
+    if args.startup:
+        failures = 0
+        for module, result in run_startup(args.repeat).items():
+            flag = ""
+            if result["seconds"] > result["budget"]:
+                failures += 1
+                flag = "  OVER BUDGET"
+            if result["heavy_imports"]:
+                failures += 1
+                flag += f"  imports {', '.join(result['heavy_imports'])}"
+            print(
+                f"{module:16} {result['seconds'] * 1e3:8.1f} ms "
+                f"(budget {result['budget'] * 1e3:.0f} ms){flag}"
+            )
+        if failures:
+            sys.exit(1)
+        return
+
+    results = run_all(args.select, args.repeat, args.min_time)
+    for name, result in results["benchmarks"].items():
+        print(f"{name:36} {result['seconds_per_call'] * 1e6:12.2f} us")
+
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(results, stream, indent=2)
+
+    if not args.baseline:
+        return
+    with open(args.baseline) as stream:
+        baseline = json.load(stream)
+
+    regressions = 0
+    print()
+    for name, before, after, ratio in compare(results, baseline):
+        flag = ""
+        if ratio > 1 + args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{name:36} {before * 1e6:10.2f} -> {after * 1e6:10.2f} us "
+            f"({ratio:5.2f}x){flag}"
+        )
+    if regressions:
+        print(
+            f"{regressions} benchmark(s) slowed down by more than {args.threshold:.0%}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ from dataclasses import dataclass, field
 from typing import Literal
 
 from chess.exceptions import AmbiguousMoveError, IllegalMoveError, OutOfBoundsError
-from chess.move import int_str_file_map, int_str_rank_map, position_map
+from chess.movegen import in_check, legal_moves
 from chess.moves import (
     get_knight_squares,
     get_neighbour_function,
@@ -13,11 +13,20 @@ from chess.moves import (
 )
 from chess.pieces import Piece, PieceType
 from chess.square import Square
-from chess.utils import Colour, MoveCategory, other_colour
+from chess.utils import (
+    Colour,
+    MoveCategory,
+    int_str_file_map,
+    int_str_rank_map,
+    other_colour,
+    position_map,
+)
 
 Position = tuple[int, int]
 Grid = dict[Position, Square]
 
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+
 
 def empty_board() -> Grid:
     grid: Grid = {}
@@ -42,7 +51,12 @@ class Board:
                 if char.isnumeric():
                     column += int(char)
                     continue
-                board.place(column, ind_rank, Piece.from_fen(char))
+                piece = Piece.from_fen(char)
+                if piece.type == PieceType.PAWN and ind_rank not in (1, 6):
+                    # A pawn off its starting rank has already made its double step
+                    piece.move()
+                    piece.last_moved = False
+                board.place(column, ind_rank, piece)
                 column += 1
             if column != 8:
                 raise ValueError("Invalid FEN string")
@@ -259,19 +273,4 @@ class Board:
         return False
 
     def check_for_checkmate(self, colour: Literal[Colour.WHITE, Colour.BLACK]) -> bool:
-        checkmate = True
-        for square in self.squares.values():
-            for piece_type in PieceType:
-                if piece_type != PieceType.EMPTY:
-                    for move_category in [MoveCategory.REGULAR, MoveCategory.CAPTURE]:
-                        squares = self.find_origin_squares(
-                            piece_type, square, move_category, colour
-                        )
-                        try:
-                            self.validate_origin_squares(squares)
-                        except IllegalMoveError:
-                            continue
-                        if not self.king_is_in_check(colour):
-                            checkmate = False
-
-        return checkmate
+        return in_check(self, colour) and not legal_moves(self, colour)
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import random
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+from enum import StrEnum, auto
+from typing import Iterable, Optional
+
+from chess.board import STARTING_FEN, Board
+from chess.exceptions import NotationError
+from chess.movegen import CoordinateMove, legal_moves, make_move, parse_san, san
+from chess.pgn import read_games
+from chess.pieces import PieceType
+from chess.utils import Colour, other_colour
+from chess.zobrist import polyglot_key
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+MAX_WEIGHT = 0xFFFF
+
+PROMOTION_CODE: dict[PieceType, int] = {
+    PieceType.EMPTY: 0,
+    PieceType.KNIGHT: 1,
+    PieceType.BISHOP: 2,
+    PieceType.ROOK: 3,
+    PieceType.QUEEN: 4,
+}
+CODE_PROMOTION = {code: piece_type for piece_type, code in PROMOTION_CODE.items()}
+
+
+class BookSelection(StrEnum):
+    BEST = auto()
+    WEIGHTED = auto()
+
+
+@dataclass(frozen=True)
+class BookEntry:
+    key: int
+    raw_move: int
+    weight: int
+    learn: int = 0
+
+    def move(self, board: Board) -> CoordinateMove:
+        return decode_move(board, self.raw_move)
+
+
+def lower_bound(memory: mmap.mmap, count: int, size: int, key: int) -> int:
+    # The first of count records of size bytes, sorted by the 64 bit key each
+    # starts with, whose key is not below key
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if KEY.unpack_from(memory, middle * size)[0] < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def encode_move(board: Board, move: CoordinateMove) -> int:
+    origin_file, origin_rank = move.origin
+    destination_file, destination_rank = move.destination
+    # Polyglot writes castling as the king capturing its own rook
+    piece = board.squares[move.origin].piece
+    if piece.type == PieceType.KING and abs(destination_file - origin_file) == 2:
+        destination_file = 7 if destination_file == 6 else 0
+    return (
+        destination_file
+        | destination_rank << 3
+        | origin_file << 6
+        | origin_rank << 9
+        | PROMOTION_CODE[move.promote_to] << 12
+    )
+
+
+def decode_move(board: Board, raw_move: int) -> CoordinateMove:
+    destination = (raw_move & 7, (raw_move >> 3) & 7)
+    origin = ((raw_move >> 6) & 7, (raw_move >> 9) & 7)
+    promote_to = CODE_PROMOTION.get((raw_move >> 12) & 7, PieceType.EMPTY)
+    piece = board.squares[origin].piece
+    target = board.squares[destination].piece
+    if (
+        piece.type == PieceType.KING
+        and target.type == PieceType.ROOK
+        and target.colour == piece.colour
+    ):
+        destination = (6 if destination[0] == 7 else 2, destination[1])
+    return CoordinateMove(origin, destination, promote_to)
+
+
+class OpeningBook:
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size % ENTRY.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a Polyglot book")
+        self._count = size // ENTRY.size
+        self._map: Optional[mmap.mmap] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> OpeningBook:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def find(self, key: int) -> list[BookEntry]:
+        if self._map is None:
+            return []
+        entries: list[BookEntry] = []
+        index = lower_bound(self._map, self._count, ENTRY.size, key)
+        while index < self._count:
+            entry = BookEntry(*ENTRY.unpack_from(self._map, index * ENTRY.size))
+            if entry.key != key:
+                break
+            entries.append(entry)
+            index += 1
+        return entries
+
+    def entries(self, board: Board, colour: Colour) -> list[BookEntry]:
+        return self.find(polyglot_key(board, colour))
+
+    def choose_move(
+        self,
+        board: Board,
+        colour: Colour,
+        selection: BookSelection = BookSelection.WEIGHTED,
+        rng: Optional[random.Random] = None,
+    ) -> Optional[CoordinateMove]:
+        legal = legal_moves(board, colour)
+        candidates = [
+            (entry.weight, move)
+            for entry in self.entries(board, colour)
+            if (move := entry.move(board)) in legal
+        ]
+        if not candidates:
+            return None
+        if selection == BookSelection.BEST:
+            return max(candidates, key=lambda candidate: candidate[0])[1]
+        weights = [weight for weight, _ in candidates]
+        if not any(weights):
+            return None
+        moves = [move for _, move in candidates]
+        return (rng or random).choices(moves, weights=weights)[0]
+
+
+def write_book(path: str | os.PathLike[str], entries: Iterable[BookEntry]) -> int:
+    ordered = sorted(entries, key=lambda entry: (entry.key, -entry.weight))
+    with open(path, "wb") as stream:
+        for entry in ordered:
+            stream.write(
+                ENTRY.pack(entry.key, entry.raw_move, entry.weight, entry.learn)
+            )
+    return len(ordered)
+
+
+def build_book(
+    pgn_paths: Iterable[str | os.PathLike[str]],
+    max_ply: int = 20,
+    min_games: int = 1,
+) -> list[BookEntry]:
+    # Polyglot weighting: two points per win and one per draw for the side moving
+    scores: dict[tuple[int, int], int] = defaultdict(int)
+    games: dict[tuple[int, int], int] = defaultdict(int)
+    outcome = {
+        "1-0": {Colour.WHITE: 2, Colour.BLACK: 0},
+        "0-1": {Colour.WHITE: 0, Colour.BLACK: 2},
+    }
+
+    for pgn_path in pgn_paths:
+        with open(pgn_path, encoding="utf-8", errors="replace") as stream:
+            for game in read_games(stream):
+                if "FEN" in game.headers:
+                    continue
+                points = outcome.get(game.result, {Colour.WHITE: 1, Colour.BLACK: 1})
+                board = Board.from_fen(STARTING_FEN)
+                colour = Colour.WHITE
+                for text in game.moves[:max_ply]:
+                    try:
+                        move = parse_san(board, text, colour)
+                    except NotationError:
+                        break
+                    index = (polyglot_key(board, colour), encode_move(board, move))
+                    scores[index] += points[colour]
+                    games[index] += 1
+                    make_move(board, move)
+                    colour = other_colour(colour)
+
+    kept = {
+        index: score
+        for index, score in scores.items()
+        if games[index] >= min_games and score > 0
+    }
+    scale = max(kept.values(), default=0) / MAX_WEIGHT
+    return [
+        BookEntry(key, raw_move, max(1, round(score / scale)) if scale > 1 else score)
+        for (key, raw_move), score in kept.items()
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.book", description="Build and probe opening books"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build a book from PGN files")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("-o", "--output", required=True)
+    build.add_argument("--max-ply", type=int, default=20)
+    build.add_argument("--min-games", type=int, default=1)
+
+    probe = commands.add_parser("probe", help="list book moves after a line")
+    probe.add_argument("book")
+    probe.add_argument("moves", nargs="*", help="SAN moves from the start position")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        entries = build_book(args.pgn, args.max_ply, args.min_games)
+        count = write_book(args.output, entries)
+        print(f"Wrote {count} entries to {args.output}")
+        return
+
+    board = Board.from_fen(STARTING_FEN)
+    colour = Colour.WHITE
+    for text in args.moves:
+        make_move(board, parse_san(board, text, colour))
+        colour = other_colour(colour)
+    with OpeningBook(args.book) as book:
+        entries = book.entries(board, colour)
+        total = sum(entry.weight for entry in entries) or 1
+        for entry in entries:
+            move_text = san(board, entry.move(board), colour)
+            print(f"{move_text:8} {entry.weight:6} {100 * entry.weight / total:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
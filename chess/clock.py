@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+from chess.search import MATE_BOUND, SearchResult
+from chess.utils import Colour, other_colour
+
+if TYPE_CHECKING:
+    from chess.movegen import CoordinateMove
+
+# Moves a game is expected to last, and the fewest still assumed to be left
+EXPECTED_MOVES = 40
+MIN_MOVES_LEFT = 10
+# How far the soft limit stretches with the number of iterations the best
+# move has survived unchanged: a move that has just changed earns more time
+STABILITY_SCALE = (1.5, 1.0, 0.8, 0.6)
+# Each depth is assumed to take at least this many times as long as the one
+# before, or longer if the last two depths did
+DEPTH_GROWTH = 6
+
+
+def format_time(seconds: float) -> str:
+    seconds = max(seconds, 0.0)
+    return f"{int(seconds // 60)}:{seconds % 60:04.1f}"
+
+
+@dataclass
+class Clock:
+    base: float
+    increment: float = 0.0
+    remaining: dict[Colour, float] = field(init=False)
+    moves: dict[Colour, int] = field(init=False)
+    running: Optional[Colour] = field(default=None, init=False)
+    started: float = field(default=0.0, init=False)
+
+    def __post_init__(self) -> None:
+        self.remaining = {Colour.WHITE: self.base, Colour.BLACK: self.base}
+        self.moves = {Colour.WHITE: 0, Colour.BLACK: 0}
+
+    def start(self, colour: Colour) -> None:
+        self.running = colour
+        self.started = time.monotonic()
+
+    def stop(self) -> float:
+        if self.running is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started
+        self.remaining[self.running] -= elapsed
+        self.running = None
+        return elapsed
+
+    def press(self) -> float:
+        # Ends the running side's move, adding its increment unless it has
+        # already run out of time, and starts the opponent's clock
+        colour = self.running
+        assert colour is not None
+        elapsed = self.stop()
+        if self.remaining[colour] > 0:
+            self.remaining[colour] += self.increment
+        self.moves[colour] += 1
+        self.start(other_colour(colour))
+        return elapsed
+
+    def hand_to(self, colour: Colour) -> None:
+        # Moves taken back or replayed pass the turn without a press, so the
+        # running clock goes to the side now to move, with no increment
+        if self.running is not None and self.running != colour:
+            self.stop()
+            self.start(colour)
+
+    def time_left(self, colour: Colour) -> float:
+        if colour == self.running:
+            return self.remaining[colour] - (time.monotonic() - self.started)
+        return self.remaining[colour]
+
+    def flagged(self, colour: Colour) -> bool:
+        return self.time_left(colour) <= 0
+
+    def __str__(self) -> str:
+        return " | ".join(
+            f"{colour} {format_time(self.time_left(colour))}"
+            for colour in (Colour.WHITE, Colour.BLACK)
+        )
+
+
+@dataclass
+class MoveTimer:
+    soft: float
+    hard: float
+    start: float = field(default_factory=time.monotonic)
+    best_move: Optional[CoordinateMove] = None
+    stable_iterations: int = 0
+    iteration_ends: list[float] = field(default_factory=list)
+
+    @property
+    def deadline(self) -> float:
+        return self.start + self.hard
+
+    def restart(self, soft: float, hard: float) -> None:
+        # A ponder hit turns an unlimited search into a timed one from now
+        # on. Past iteration ends shift with the start, so depths already
+        # timed still predict the next. The start moves before the limits,
+        # so a search reading them meanwhile never sees an early deadline
+        now = time.monotonic()
+        self.iteration_ends = [end - (now - self.start) for end in self.iteration_ends]
+        self.start = now
+        self.soft = soft
+        self.hard = hard
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def stop_after(self, result: SearchResult) -> bool:
+        # Called after every completed depth, to decide whether another is
+        # worth starting; the hard limit is left to the search itself
+        if result.move == self.best_move:
+            self.stable_iterations += 1
+        else:
+            self.best_move = result.move
+            self.stable_iterations = 0
+        if abs(result.score) >= MATE_BOUND:
+            return True
+        elapsed = self.elapsed()
+        ends = self.iteration_ends
+        ends.append(elapsed)
+        iteration = elapsed - (ends[-2] if len(ends) > 1 else 0.0)
+        growth = DEPTH_GROWTH
+        if len(ends) > 2 and ends[-2] - ends[-3] > 0:
+            growth = max(growth, iteration / (ends[-2] - ends[-3]))
+        # The next depth is only started if it should finish within twice the
+        # soft limit, so that on average a move takes about the soft limit,
+        # and before the hard limit would cut it off and waste it
+        scale = STABILITY_SCALE[min(self.stable_iterations, len(STABILITY_SCALE) - 1)]
+        finish = elapsed + growth * iteration
+        return finish > self.hard or finish > 2 * self.soft * scale
+
+
+@dataclass
+class TimeManager:
+    expected_moves: int = EXPECTED_MOVES
+    min_moves_left: int = MIN_MOVES_LEFT
+    # Kept back on every move for the work around the search
+    overhead: float = 0.05
+
+    def limits(
+        self, remaining: float, increment: float, moves_played: int
+    ) -> tuple[float, float]:
+        available = max(remaining - self.overhead, 0.0)
+        moves_left = max(self.expected_moves - moves_played, self.min_moves_left)
+        soft = min(available / moves_left + 0.75 * increment, 0.25 * available)
+        hard = min(4 * soft, 0.5 * available)
+        return soft, hard
+
+    def start(self, remaining: float, increment: float, moves_played: int) -> MoveTimer:
+        return MoveTimer(*self.limits(remaining, increment, moves_played))
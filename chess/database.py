@@ -0,0 +1,449 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+from chess.board import STARTING_FEN, Board
+from chess.book import lower_bound
+from chess.epd import CASTLING_LETTERS, FEN_LETTER, board_from_fen
+from chess.exceptions import NotationError
+from chess.journal import decode_move, encode_move
+from chess.movegen import (
+    PAWN_DIRECTION,
+    can_castle,
+    en_passant_target,
+    make_move,
+    parse_san,
+    san,
+)
+from chess.pgn import read_games
+from chess.pieces import PieceType
+from chess.utils import Colour, int_str_file_map, other_colour
+from chess.zobrist import en_passant_key, polyglot_key
+
+# A database is a directory of three files. keys holds the sorted position
+# keys on their own, so that a lookup's binary search touches as few pages
+# as possible; positions holds a record for each key, in the same order,
+# pointing at its run of records in moves
+KEYS_FILE = "keys"
+POSITIONS_FILE = "positions"
+MOVES_FILE = "moves"
+
+KEY = struct.Struct(">Q")
+# Packed position, wins, draws and losses for the side to move, then the
+# index and number of its moves
+POSITION = struct.Struct(">33sIIIIH")
+# Journal move code, then wins, draws and losses for the side that played it
+MOVE = struct.Struct(">HIII")
+
+# A nibble per square, rank 1 first: 0 for an empty square, then the White
+# and the Black pieces. A pawn that can be taken en passant gets a code of
+# its own, so the position fits in 32 bytes plus a state byte holding the
+# side to move and the castling rights
+NIBBLE: dict[tuple[PieceType, Colour], int] = {
+    (piece_type, colour): 1 + index + 6 * (colour == Colour.BLACK)
+    for index, piece_type in enumerate(
+        (
+            PieceType.PAWN,
+            PieceType.KNIGHT,
+            PieceType.BISHOP,
+            PieceType.ROOK,
+            PieceType.QUEEN,
+            PieceType.KING,
+        )
+    )
+    for colour in (Colour.WHITE, Colour.BLACK)
+}
+NIBBLE_PIECE = {code: piece for piece, code in NIBBLE.items()}
+EN_PASSANT_PAWN = 13
+
+# Results as wins, draws and losses for White; reversed for Black
+RESULT_INDEX = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+# Positions held in memory before they are written out as a sorted run
+RUN_POSITIONS = 1 << 18
+
+
+def pack_position(board: Board, colour: Colour) -> bytes:
+    codes = [0] * 64
+    for (file, rank), square in board.squares.items():
+        piece = square.piece
+        if piece.type != PieceType.EMPTY:
+            codes[rank * 8 + file] = NIBBLE[(piece.type, piece.colour)]
+    # As in the position key, en passant only counts when the capture is there
+    if en_passant_key(board, colour):
+        target = en_passant_target(board, colour)
+        assert target is not None
+        codes[(target[1] - PAWN_DIRECTION[colour]) * 8 + target[0]] = EN_PASSANT_PAWN
+
+    state = colour == Colour.BLACK
+    for bit, (_, castle_colour, move_category, _) in enumerate(CASTLING_LETTERS, 1):
+        if can_castle(board, castle_colour, move_category):  # type: ignore[arg-type]
+            state |= 1 << bit
+    mailbox = bytes(codes[index] << 4 | codes[index + 1] for index in range(0, 64, 2))
+    return mailbox + bytes([state])
+
+
+def unpack_position(packed: bytes) -> tuple[Board, Colour]:
+    state = packed[32]
+    colour = Colour.BLACK if state & 1 else Colour.WHITE
+    en_passant = "-"
+    ranks = []
+    for rank in range(7, -1, -1):
+        text = ""
+        empty = 0
+        for file in range(8):
+            square = rank * 8 + file
+            code = packed[square // 2] >> (0 if square % 2 else 4) & 0xF
+            if code == 0:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            if code == EN_PASSANT_PAWN:
+                piece = (PieceType.PAWN, other_colour(colour))
+                target_rank = rank + PAWN_DIRECTION[colour]
+                en_passant = int_str_file_map[file] + str(target_rank + 1)
+            else:
+                piece = NIBBLE_PIECE[code]
+            text += FEN_LETTER[piece]
+        ranks.append(text + (str(empty) if empty else ""))
+    rights = "".join(
+        letter
+        for bit, (letter, *_) in enumerate(CASTLING_LETTERS, 1)
+        if state >> bit & 1
+    )
+    side = "b" if colour == Colour.BLACK else "w"
+    return board_from_fen(f"{'/'.join(ranks)} {side} {rights or '-'} {en_passant}")
+
+
+@dataclass
+class PositionRecord:
+    key: int
+    position: bytes
+    # Wins, draws and losses for the side to move, over every game that
+    # reached the position
+    results: list[int] = field(default_factory=lambda: [0, 0, 0])
+    # The same counts for each move played from it, by journal move code
+    moves: dict[int, list[int]] = field(default_factory=dict)
+
+    @property
+    def games(self) -> int:
+        return sum(self.results)
+
+    def add(self, other: PositionRecord) -> None:
+        for index, count in enumerate(other.results):
+            self.results[index] += count
+        for code, results in other.moves.items():
+            totals = self.moves.setdefault(code, [0, 0, 0])
+            for index, count in enumerate(results):
+                totals[index] += count
+
+
+class PositionDatabase:
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = path
+        self._files = []
+        self._maps: list[Optional[mmap.mmap]] = []
+        for name in (KEYS_FILE, POSITIONS_FILE, MOVES_FILE):
+            stream = open(os.path.join(path, name), "rb")
+            size = os.fstat(stream.fileno()).st_size
+            self._files.append(stream)
+            self._maps.append(
+                mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            )
+        sizes = [len(memory) if memory is not None else 0 for memory in self._maps]
+        self._count = sizes[0] // KEY.size
+        if (
+            sizes[0] % KEY.size
+            or sizes[1] != self._count * POSITION.size
+            or sizes[2] % MOVE.size
+        ):
+            self.close()
+            raise ValueError(f"{path} is not a position database")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> PositionDatabase:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for memory in self._maps:
+            if memory is not None:
+                memory.close()
+        self._maps = []
+        for stream in self._files:
+            stream.close()
+
+    def _record(self, index: int, key: int) -> PositionRecord:
+        _, positions, moves = self._maps
+        position, wins, draws, losses, first, count = POSITION.unpack_from(
+            positions, index * POSITION.size  # type: ignore[arg-type]
+        )
+        record = PositionRecord(key, position, [wins, draws, losses])
+        for offset in range(first * MOVE.size, (first + count) * MOVE.size, MOVE.size):
+            code, *results = MOVE.unpack_from(moves, offset)  # type: ignore[arg-type]
+            record.moves[code] = results
+        return record
+
+    def find(self, key: int) -> Optional[PositionRecord]:
+        keys = self._maps[0]
+        if keys is None:
+            return None
+        low = lower_bound(keys, self._count, KEY.size, key)
+        if low == self._count or KEY.unpack_from(keys, low * KEY.size)[0] != key:
+            return None
+        return self._record(low, key)
+
+    def lookup(self, board: Board, colour: Colour) -> Optional[PositionRecord]:
+        # The packed position tells a real match from a key collision
+        record = self.find(polyglot_key(board, colour))
+        if record is None or record.position != pack_position(board, colour):
+            return None
+        return record
+
+    def records(self) -> Iterator[PositionRecord]:
+        keys = self._maps[0]
+        for index in range(self._count):
+            yield self._record(index, KEY.unpack_from(keys, index * KEY.size)[0])  # type: ignore[arg-type]
+
+
+def write_database(
+    path: str | os.PathLike[str], records: Iterable[PositionRecord]
+) -> int:
+    # The records must come in key order, each key once
+    os.makedirs(path, exist_ok=True)
+    count = 0
+    moves_written = 0
+    with open(os.path.join(path, KEYS_FILE), "wb") as keys, open(
+        os.path.join(path, POSITIONS_FILE), "wb"
+    ) as positions, open(os.path.join(path, MOVES_FILE), "wb") as moves:
+        for record in records:
+            keys.write(KEY.pack(record.key))
+            positions.write(
+                POSITION.pack(
+                    record.position, *record.results, moves_written, len(record.moves)
+                )
+            )
+            for code, results in sorted(
+                record.moves.items(), key=lambda item: (-sum(item[1]), item[0])
+            ):
+                moves.write(MOVE.pack(code, *results))
+            moves_written += len(record.moves)
+            count += 1
+    return count
+
+
+def merge_records(
+    sources: Iterable[Iterable[PositionRecord]],
+) -> Iterator[PositionRecord]:
+    # Sorted runs merge in one pass, adding up the counts of shared positions
+    current: Optional[PositionRecord] = None
+    for record in heapq.merge(*sources, key=lambda record: record.key):
+        if current is not None and current.key == record.key:
+            current.add(record)
+            continue
+        if current is not None:
+            yield current
+        current = record
+    if current is not None:
+        yield current
+
+
+def game_records(
+    headers: dict[str, str], moves: list[str], result: str, max_ply: Optional[int]
+) -> Iterator[PositionRecord]:
+    # A record for each distinct position of the game, with the moves played
+    # from it. A position that recurs still counts the game once, and so does
+    # a move played from it more than once
+    if "FEN" in headers:
+        board, colour = board_from_fen(headers["FEN"])
+    else:
+        board, colour = Board.from_fen(STARTING_FEN), Colour.WHITE
+    white_index = RESULT_INDEX[result]
+    records: dict[int, PositionRecord] = {}
+    for text in [*moves[:max_ply], None]:
+        index = white_index if colour == Colour.WHITE else 2 - white_index
+        key = polyglot_key(board, colour)
+        record = records.get(key)
+        if record is None:
+            record = PositionRecord(key, pack_position(board, colour))
+            record.results[index] += 1
+            records[key] = record
+        move = None
+        if text is not None:
+            try:
+                move = parse_san(board, text, colour)
+            except NotationError:
+                pass
+        if move is None:
+            break
+        results = [0, 0, 0]
+        results[index] += 1
+        record.moves.setdefault(encode_move(move), results)
+        make_move(board, move)
+        colour = other_colour(colour)
+    yield from records.values()
+
+
+def merge_databases(
+    path: str | os.PathLike[str], sources: Iterable[str | os.PathLike[str]]
+) -> int:
+    # Writes beside path and swaps the result in, so path may be a source
+    path = os.fspath(path).rstrip(os.sep)
+    databases = [PositionDatabase(source) for source in sources]
+    output = tempfile.mkdtemp(prefix=".merge-", dir=os.path.dirname(path) or ".")
+    try:
+        count = write_database(
+            output, merge_records(database.records() for database in databases)
+        )
+    except BaseException:
+        shutil.rmtree(output)
+        raise
+    finally:
+        for database in databases:
+            database.close()
+    # mkdtemp makes the directory private; give it the mode os.makedirs would
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(output, 0o777 & ~umask)
+    if os.path.isdir(path):
+        previous = output + ".old"
+        os.rename(path, previous)
+        os.rename(output, path)
+        shutil.rmtree(previous)
+    else:
+        os.rename(output, path)
+    return count
+
+
+def import_games(
+    path: str | os.PathLike[str],
+    pgn_paths: Iterable[str | os.PathLike[str]],
+    max_ply: Optional[int] = None,
+    run_positions: int = RUN_POSITIONS,
+) -> tuple[int, int]:
+    # Games are streamed into memory until run_positions distinct positions
+    # are held, then written out as a sorted run. The runs and any database
+    # already at path are merged at the end, so adding games to a database
+    # costs a pass over it rather than a fresh import of every game
+    path = os.fspath(path).rstrip(os.sep)
+    work = tempfile.mkdtemp(prefix=".import-", dir=os.path.dirname(path) or ".")
+    runs: list[str] = []
+    records: dict[int, PositionRecord] = {}
+
+    def write_run() -> None:
+        if records:
+            run = os.path.join(work, str(len(runs)))
+            write_database(run, (records[key] for key in sorted(records)))
+            runs.append(run)
+            records.clear()
+
+    games = 0
+    try:
+        for pgn_path in pgn_paths:
+            with open(pgn_path, encoding="utf-8", errors="replace") as stream:
+                for game in read_games(stream):
+                    if game.result not in RESULT_INDEX:
+                        continue
+                    games += 1
+                    for record in game_records(
+                        game.headers, game.moves, game.result, max_ply
+                    ):
+                        existing = records.get(record.key)
+                        if existing is None:
+                            records[record.key] = record
+                        else:
+                            existing.add(record)
+                    if len(records) >= run_positions:
+                        write_run()
+        write_run()
+        sources = runs + ([path] if os.path.isdir(path) else [])
+        count = merge_databases(path, sources) if sources else 0
+    finally:
+        shutil.rmtree(work)
+    return games, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.database",
+        description="Build and probe a database of positions from PGN games",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser(
+        "import", help="add PGN games to a database, creating it if needed"
+    )
+    add.add_argument("database")
+    add.add_argument("pgn", nargs="+")
+    add.add_argument("--max-ply", type=int, help="only import this many plies a game")
+    add.add_argument(
+        "--run-positions",
+        type=int,
+        default=RUN_POSITIONS,
+        help="positions held in memory before a sorted run is written",
+    )
+
+    merge = commands.add_parser("merge", help="merge databases into one")
+    merge.add_argument("output")
+    merge.add_argument("databases", nargs="+")
+
+    probe = commands.add_parser("probe", help="show the games after a line")
+    probe.add_argument("database")
+    probe.add_argument("moves", nargs="*", help="SAN moves from the start position")
+    probe.add_argument("--fen", help="standard FEN to start from instead")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        games, count = import_games(
+            args.database, args.pgn, args.max_ply, args.run_positions
+        )
+        print(f"Imported {games} games; {args.database} holds {count} positions")
+        return
+    if args.command == "merge":
+        count = merge_databases(args.output, args.databases)
+        print(f"Wrote {count} positions to {args.output}")
+        return
+
+    if args.fen:
+        board, colour = board_from_fen(args.fen)
+    else:
+        board, colour = Board.from_fen(STARTING_FEN), Colour.WHITE
+    for text in args.moves:
+        make_move(board, parse_san(board, text, colour))
+        colour = other_colour(colour)
+    with PositionDatabase(args.database) as database:
+        record = database.lookup(board, colour)
+    if record is None:
+        print("Position not found")
+        return
+
+    def line(label: str, results: list[int]) -> str:
+        games = sum(results) or 1
+        wins, draws, losses = (100 * count / games for count in results)
+        return (
+            f"{label:8} {sum(results):8} games "
+            f"+{wins:5.1f}% ={draws:5.1f}% -{losses:5.1f}%"
+        )
+
+    print(line("total", record.results))
+    for code, results in sorted(
+        record.moves.items(), key=lambda item: (-sum(item[1]), item[0])
+    ):
+        print(line(san(board, decode_move(code), colour), results))
+
+
+if __name__ == "__main__":
+    main()
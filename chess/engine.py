@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import copy
+import math
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from chess.board import Board
+from chess.book import BookSelection, OpeningBook
+from chess.clock import Clock, MoveTimer, TimeManager
+from chess.exceptions import IllegalMoveError
+from chess.movegen import CoordinateMove, legal_moves, make_move
+from chess.players import Player
+from chess.search import MAX_DEPTH, Searcher, SearchResult
+from chess.tablebase import Tablebase
+from chess.utils import other_colour
+from chess.zobrist import polyglot_key
+
+
+@dataclass
+class Ponder:
+    key: int
+    stop: threading.Event
+    thread: Optional[threading.Thread] = None
+    result: Optional[SearchResult] = None
+    # Under a clock the search is unlimited until the opponent moves, and a
+    # hit gives it the move's time limits
+    timer: Optional[MoveTimer] = None
+
+
+@dataclass
+class EnginePlayer(Player):
+    depth: int = 3
+    book: Optional[OpeningBook] = None
+    book_selection: BookSelection = BookSelection.WEIGHTED
+    rng: random.Random = field(default_factory=random.Random)
+    tablebase: Optional[Tablebase] = None
+    searcher: Searcher = field(default_factory=Searcher)
+    ponder: bool = False
+    ponder_hits: int = 0
+    ponder_misses: int = 0
+    time_manager: TimeManager = field(default_factory=TimeManager)
+    # The limits the last move was searched under, when playing on a clock
+    timer: Optional[MoveTimer] = field(default=None, init=False, repr=False)
+    _pondering: Optional[Ponder] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.tablebase is not None:
+            self.searcher.tablebase = self.tablebase
+
+    def choose_move(
+        self, board: Board, clock: Optional[Clock] = None
+    ) -> CoordinateMove:
+        self.timer = None
+        if clock is not None:
+            self.timer = self.time_manager.start(
+                clock.time_left(self.colour), clock.increment, clock.moves[self.colour]
+            )
+        pondered = self.stop_pondering(board, self.timer)
+        if self.book is not None:
+            book_move = self.book.choose_move(
+                board, self.colour, self.book_selection, self.rng
+            )
+            if book_move is not None:
+                return book_move
+
+        if pondered is not None and pondered.move is not None:
+            return pondered.move
+        if self.timer is None:
+            result = self.searcher.search(board, self.colour, self.depth)
+        else:
+            result = self.searcher.search(
+                board, self.colour, MAX_DEPTH, timer=self.timer
+            )
+        if result.move is None:
+            raise IllegalMoveError("There are no legal moves in this position!")
+        return result.move
+
+    def expected_reply(self, board: Board) -> Optional[CoordinateMove]:
+        # The search that chose our move left the opponent's best reply in
+        # the hash table, under the position it now has to move from
+        if self.searcher.table is None:
+            return None
+        opponent = other_colour(self.colour)
+        entry = self.searcher.table.probe(polyglot_key(board, opponent))
+        if entry is None or entry.move not in legal_moves(board, opponent):
+            return None
+        return entry.move
+
+    def start_pondering(self, board: Board, clock: Optional[Clock] = None) -> None:
+        # Search the position after the expected reply while the opponent
+        # thinks; the search runs on its own copy of the board
+        self.stop_pondering()
+        reply = self.expected_reply(board)
+        if reply is None:
+            return
+        board = copy.deepcopy(board)
+        make_move(board, reply)
+        ponder = Ponder(polyglot_key(board, self.colour), threading.Event())
+        depth = self.depth
+        if clock is not None:
+            ponder.timer = MoveTimer(math.inf, math.inf)
+            depth = MAX_DEPTH
+
+        def search() -> None:
+            ponder.result = self.searcher.search(
+                board, self.colour, depth, ponder.stop, timer=ponder.timer
+            )
+
+        ponder.thread = threading.Thread(target=search, daemon=True)
+        self._pondering = ponder
+        ponder.thread.start()
+
+    def stop_pondering(
+        self, board: Optional[Board] = None, timer: Optional[MoveTimer] = None
+    ) -> Optional[SearchResult]:
+        # When the opponent played the expected move the search is allowed to
+        # finish, under timer's limits if it was pondering on a clock, and its
+        # result returned; otherwise it is aborted
+        ponder = self._pondering
+        if ponder is None:
+            return None
+        self._pondering = None
+        assert ponder.thread is not None
+        if board is not None and polyglot_key(board, self.colour) == ponder.key:
+            if ponder.timer is not None:
+                if timer is None:
+                    ponder.stop.set()
+                else:
+                    ponder.timer.restart(timer.soft, timer.hard)
+            ponder.thread.join()
+            self.ponder_hits += 1
+            return ponder.result
+        ponder.stop.set()
+        ponder.thread.join()
+        if board is not None:
+            self.ponder_misses += 1
+        return None
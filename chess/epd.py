@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from chess.board import Board
+from chess.movegen import BACK_RANK, PAWN_DIRECTION, can_castle, en_passant_target
+from chess.pieces import FEN_MAP, PieceType
+from chess.utils import Colour, MoveCategory, int_str_file_map, position_map
+
+# Standard FEN and EPD: rank 8 first, upper case for White, unlike Board.from_fen
+FEN_LETTER = {
+    (piece_type, colour): letter.upper() if colour == Colour.WHITE else letter
+    for letter, piece_type in FEN_MAP.items()
+    for colour in (Colour.WHITE, Colour.BLACK)
+}
+SIDE = {"w": Colour.WHITE, "b": Colour.BLACK}
+CASTLING_LETTERS = (
+    ("K", Colour.WHITE, MoveCategory.SHORT_CASTLE, 7),
+    ("Q", Colour.WHITE, MoveCategory.LONG_CASTLE, 0),
+    ("k", Colour.BLACK, MoveCategory.SHORT_CASTLE, 7),
+    ("q", Colour.BLACK, MoveCategory.LONG_CASTLE, 0),
+)
+
+STRING_OPCODES = {"id", *(f"c{digit}" for digit in range(10))}
+
+_OPERAND = re.compile(r'"(?P<string>[^"]*)"|(?P<end>;)|(?P<token>[^\s;"]+)')
+
+
+@dataclass
+class EpdRecord:
+    board: Board
+    colour: Colour
+    operations: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def id(self) -> str:
+        return " ".join(self.operations.get("id", []))
+
+
+def board_from_fen(fen: str) -> tuple[Board, Colour]:
+    fields = fen.split()
+    if len(fields) < 2 or fields[1] not in SIDE:
+        raise ValueError(f"Invalid FEN string: {fen}")
+    placement = "/".join(rank.swapcase() for rank in reversed(fields[0].split("/")))
+    board = Board.from_fen(placement)
+    colour = SIDE[fields[1]]
+
+    # Board has no castling flags, so a lost right is shown by a moved rook
+    rights = fields[2] if len(fields) > 2 else "-"
+    for letter, castle_colour, _, rook_file in CASTLING_LETTERS:
+        rook = board.squares[(rook_file, BACK_RANK[castle_colour])].piece
+        if letter not in rights and rook.type == PieceType.ROOK:
+            rook.move()
+            rook.last_moved = False
+
+    # Likewise en passant comes from the pawn that moved last
+    target = fields[3] if len(fields) > 3 else "-"
+    if target != "-":
+        file, rank = position_map[(target[0], target[1])]
+        pawn = board.squares[(file, rank - PAWN_DIRECTION[colour])].piece
+        if pawn.type == PieceType.PAWN:
+            pawn.moves_made = 1
+            pawn.last_moved = True
+    return board, colour
+
+
+def board_to_fen(board: Board, colour: Colour) -> str:
+    ranks = []
+    for rank in range(7, -1, -1):
+        text = ""
+        empty = 0
+        for file in range(8):
+            piece = board.squares[(file, rank)].piece
+            if piece.type == PieceType.EMPTY:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            text += FEN_LETTER[(piece.type, piece.colour)]
+        ranks.append(text + (str(empty) if empty else ""))
+
+    rights = "".join(
+        letter
+        for letter, castle_colour, move_category, _ in CASTLING_LETTERS
+        if can_castle(board, castle_colour, move_category)  # type: ignore[arg-type]
+    )
+    target = en_passant_target(board, colour)
+    en_passant = (
+        "-" if target is None else int_str_file_map[target[0]] + str(target[1] + 1)
+    )
+    side = "w" if colour == Colour.WHITE else "b"
+    return f"{'/'.join(ranks)} {side} {rights or '-'} {en_passant}"
+
+
+def parse_epd(line: str) -> EpdRecord:
+    fields = line.split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD record: {line}")
+    board, colour = board_from_fen(" ".join(fields[:4]))
+    operations: dict[str, list[str]] = {}
+    operation: list[str] = []
+    for token in _OPERAND.finditer(fields[4] if len(fields) == 5 else ""):
+        if token.lastgroup == "end":
+            if operation:
+                operations[operation[0]] = operation[1:]
+            operation = []
+        else:
+            operation.append(token.group(token.lastgroup))
+    if operation:
+        operations[operation[0]] = operation[1:]
+    return EpdRecord(board, colour, operations)
+
+
+def format_operations(operations: dict[str, list[str]]) -> str:
+    text = ""
+    for opcode, operands in operations.items():
+        quoted = [
+            f'"{operand}"' if opcode in STRING_OPCODES or " " in operand else operand
+            for operand in operands
+        ]
+        text += " " + " ".join([opcode, *quoted]) + ";"
+    return text
+
+
+def format_epd(board: Board, colour: Colour, operations: dict[str, list[str]]) -> str:
+    return board_to_fen(board, colour) + format_operations(operations)
+
+
+def read_epd(lines: Iterable[str]) -> Iterator[EpdRecord]:
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield parse_epd(line)
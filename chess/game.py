@@ -1,13 +1,32 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from chess.adjudication import Adjudicator, Outcome, Termination
 from chess.board import Board
+from chess.clock import Clock
+from chess.engine import EnginePlayer
 from chess.exceptions import (
     Checkmate,
     IllegalMoveError,
     NotationError,
     AmbiguousMoveError,
 )
-from chess.pieces import Colour
+from chess.instrumentation import phase
+from chess.journal import GameJournal, load_journal
+from chess.movegen import (
+    CoordinateMove,
+    MoveRecord,
+    make_move,
+    move_record,
+    san,
+    unmake_move,
+)
+from chess.pieces import Colour, PieceType
 from chess.players import Player
+from chess.tablebase import Tablebase
 from chess.ui import CLI
+from chess.utils import other_colour
 
 
 def alternate_players(
@@ -25,32 +44,102 @@ def alternate_players(
 
 class ChessGame:
     def __init__(
-        self, white_player: Player, black_player: Player, board: Board, ui: CLI
+        self,
+        white_player: Player,
+        black_player: Player,
+        board: Board,
+        ui: CLI,
+        tablebase: Optional[Tablebase] = None,
+        journal: Optional[GameJournal] = None,
+        start: Colour = Colour.WHITE,
+        clock: Optional[Clock] = None,
+        adjudicator: Optional[Adjudicator] = None,
     ):
         self.white_player = white_player
         self.black_player = black_player
         self.ui = ui
         self.board = board
+        self.tablebase = tablebase
+        self.journal = journal
+        self.clock = clock
+        # A resumed game brings the adjudicator its journal was replayed into
+        self.adjudicator = adjudicator or Adjudicator(board, start)
+        self.outcome: Optional[Outcome] = None
+        # Undo records for every move played, with ply marking the current
+        # position; moves past it are the ones available to redo
+        self.history: list[MoveRecord] = []
+        self.ply = 0
+        # Journal plies count from the start of the game, which a resumed
+        # game's ply does not
+        self.journal_base = journal.plies if journal is not None else 0
 
         self.player_alternator = alternate_players(
-            self.white_player, self.black_player, Colour.WHITE
+            self.white_player, self.black_player, start
         )
         self.player = next(self.player_alternator)
 
+    @classmethod
+    def resume(
+        cls,
+        white_player: Player,
+        black_player: Player,
+        ui: CLI,
+        journal: GameJournal,
+        tablebase: Optional[Tablebase] = None,
+        clock: Optional[Clock] = None,
+    ) -> ChessGame:
+        journal.flush()
+        state = load_journal(journal.path)
+        white_player.pieces_captured = state.captured[Colour.WHITE]
+        black_player.pieces_captured = state.captured[Colour.BLACK]
+        return cls(
+            white_player,
+            black_player,
+            state.board,
+            ui,
+            tablebase,
+            journal,
+            state.colour,
+            clock,
+            state.adjudicator,
+        )
+
     def play(self) -> None:
+        if self.clock is not None:
+            self.clock.start(self.player.colour)
+        try:
+            self.play_moves()
+        finally:
+            if self.clock is not None:
+                self.clock.stop()
+            for player in (self.white_player, self.black_player):
+                if isinstance(player, EnginePlayer):
+                    player.stop_pondering()
+
+    def play_moves(self) -> None:
         game_over = False
         self.ui.show_board(
             self.board, self.white_player, self.black_player, self.player.colour
         )
         while not game_over:
+            if isinstance(self.player, EnginePlayer):
+                game_over = self.play_engine_move()
+                continue
+            if self.clock is not None:
+                print(self.clock)
             move_string = self.ui.move_prompt(self.player.colour)
+            if move_string in ("undo", "redo"):
+                self.step(move_string == "undo")
+                continue
             try:
-                move = self.ui.parse_move(move_string, self.board, self.player)
+                with phase("parse"):
+                    move = self.ui.parse_move(move_string, self.board, self.player)
             except NotationError as e:
                 print(e.message)
                 continue
             try:
-                move.validate_move(self.board)
+                with phase("validate"):
+                    move.validate_move(self.board)
             except IllegalMoveError as e:
                 print(e.message)
                 continue
@@ -58,31 +147,180 @@ class ChessGame:
                 print(e.message)
                 continue
 
-            possible_origin_squares = self.board.find_origin_squares(
-                move.piece_type,
-                move.destination,
-                move.move_category,
-                self.player.colour,
-            )
             try:
-                source_square = self.board.validate_origin_squares(
-                    possible_origin_squares, move.src_file, move.src_rank
-                )
+                with phase("resolve origin"):
+                    possible_origin_squares = self.board.find_origin_squares(
+                        move.piece_type,
+                        move.destination,
+                        move.move_category,
+                        self.player.colour,
+                    )
+                    source_square = self.board.validate_origin_squares(
+                        possible_origin_squares, move.src_file, move.src_rank
+                    )
             except (IllegalMoveError, AmbiguousMoveError) as e:
                 print(e.message)
                 continue
+            record = move_record(
+                self.board,
+                CoordinateMove(
+                    (source_square.file, source_square.rank),
+                    (move.destination.file, move.destination.rank),
+                ),
+            )
             try:
-                move.complete_move(self.board, source_square)
+                with phase("complete move"):
+                    move.complete_move(self.board, source_square)
+                    self.board.set_last_moved(move.destination)
             except IllegalMoveError as e:
                 print(e.message)
                 continue
             except Checkmate as e:
+                self.record_move(record)
+                self.outcome = Outcome(Termination.CHECKMATE, self.player.colour)
                 print(e.message)
                 game_over = True
                 break
             else:
-                self.board.set_last_moved(move.destination)
+                self.record_move(record)
                 self.player = next(self.player_alternator)
-                self.ui.show_board(
-                    self.board, self.white_player, self.black_player, self.player.colour
-                )
+                with phase("render"):
+                    self.ui.show_board(
+                        self.board,
+                        self.white_player,
+                        self.black_player,
+                        self.player.colour,
+                    )
+                game_over = self.adjudicate()
+
+    def play_engine_move(self) -> bool:
+        assert isinstance(self.player, EnginePlayer)
+        with phase("search"):
+            move = self.player.choose_move(self.board, self.clock)
+        print(
+            f"{self.player.colour} player plays {san(self.board, move, self.player.colour)}"
+        )
+        with phase("complete move"):
+            record = make_move(self.board, move)
+        if record.captured.type != PieceType.EMPTY:
+            self.player.pieces_captured.append(record.captured)
+        self.record_move(record)
+        if self.player.ponder:
+            self.player.start_pondering(self.board, self.clock)
+
+        self.player = next(self.player_alternator)
+        with phase("render"):
+            self.ui.show_board(
+                self.board, self.white_player, self.black_player, self.player.colour
+            )
+        return self.adjudicate()
+
+    def record_move(self, record: MoveRecord) -> None:
+        del self.history[self.ply :]
+        self.history.append(record)
+        self.advance(record)
+        if self.clock is not None:
+            self.clock.press()
+
+    def advance(self, record: MoveRecord) -> None:
+        self.ply += 1
+        self.adjudicator.update(
+            self.board, record.move, record.piece.type, record.captured.type
+        )
+        if self.journal is None:
+            return
+        self.journal.record(record.move)
+        if self.journal.checkpoint_due:
+            self.journal.checkpoint(
+                self.board,
+                other_colour(self.player.colour),
+                {
+                    Colour.WHITE: self.white_player.pieces_captured,
+                    Colour.BLACK: self.black_player.pieces_captured,
+                },
+                self.adjudicator.halfmove_clock,
+            )
+
+    def takeback(self) -> None:
+        if self.ply == 0:
+            raise IllegalMoveError("There are no moves to take back!")
+        self.ply -= 1
+        record = self.history[self.ply]
+        unmake_move(self.board, record)
+        self.player = next(self.player_alternator)
+        if record.captured.type != PieceType.EMPTY:
+            self.player.pieces_captured.pop()
+        self.adjudicator.undo()
+        self.outcome = None
+        if self.clock is not None:
+            self.clock.hand_to(self.player.colour)
+        if self.journal is not None:
+            self.journal.truncate(self.journal_base + self.ply)
+
+    def redo(self) -> None:
+        if self.ply == len(self.history):
+            raise IllegalMoveError("There are no moves to redo!")
+        record = make_move(self.board, self.history[self.ply].move)
+        if record.captured.type != PieceType.EMPTY:
+            self.player.pieces_captured.append(record.captured)
+        self.history[self.ply] = record
+        self.advance(record)
+        self.player = next(self.player_alternator)
+        if self.clock is not None:
+            self.clock.hand_to(self.player.colour)
+
+    def jump_to(self, ply: int) -> None:
+        if not 0 <= ply <= len(self.history):
+            raise IllegalMoveError(f"There is no position at ply {ply}!")
+        while self.ply > ply:
+            self.takeback()
+        while self.ply < ply:
+            self.redo()
+
+    def step(self, backwards: bool) -> None:
+        # Against the computer, stepping moves a whole turn so that it is
+        # still the human's move afterwards
+        plies = (
+            2
+            if any(
+                isinstance(player, EnginePlayer)
+                for player in (self.white_player, self.black_player)
+            )
+            else 1
+        )
+        for _ in range(plies):
+            try:
+                if backwards:
+                    self.takeback()
+                else:
+                    self.redo()
+            except IllegalMoveError as e:
+                print(e.message)
+                break
+        self.ui.show_board(
+            self.board, self.white_player, self.black_player, self.player.colour
+        )
+
+    def adjudicate(self) -> bool:
+        mover = other_colour(self.player.colour)
+        if self.clock is not None and self.clock.flagged(mover):
+            self.outcome = Outcome(Termination.TIME_FORFEIT, self.player.colour)
+            print(f"{mover} ran out of time - {self.outcome} - GAME OVER")
+            return True
+
+        self.outcome = self.adjudicator.outcome(self.board)
+        if self.outcome is not None:
+            print(f"{self.outcome} - GAME OVER")
+            return True
+
+        if self.tablebase is None:
+            return False
+        self.outcome = self.tablebase.outcome(self.board, self.player.colour)
+        if self.outcome is None:
+            return False
+
+        if self.outcome.winner is None:
+            print("The position is a tablebase draw - GAME OVER")
+        else:
+            print(f"{self.outcome.winner} wins with best play (tablebase) - GAME OVER")
+        return True
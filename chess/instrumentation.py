@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, ContextManager, Iterator, Optional
+
+
+@dataclass
+class CallStats:
+    calls: int = 0
+    total_time: float = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "calls": self.calls,
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.calls if self.calls else 0.0,
+        }
+
+
+_calls: dict[str, CallStats] = {}
+_phases: dict[str, CallStats] = {}
+_originals: list[tuple[type, str, Optional[Any]]] = []
+_null_phase = nullcontext()
+
+
+def _targets() -> list[tuple[type, str]]:
+    from chess.board import Board
+    from chess.move import Move
+    from chess.ui import CLI
+
+    return [
+        (Board, "find_origin_squares"),
+        (Board, "king_is_in_check"),
+        (Board, "check_for_checkmate"),
+        (Board, "validate_origin_squares"),
+        (Board, "board_string"),
+        (CLI, "parse_move"),
+        (Move, "__init__"),
+    ]
+
+
+def _timed(stats: CallStats, func: Callable[..., Any]) -> Callable[..., Any]:
+    clock = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.calls += 1
+            stats.total_time += clock() - start
+
+    return wrapper
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    # Wrapping happens here rather than with decorators so that the hot paths
+    # run the original functions untouched while instrumentation is off
+    if _originals:
+        return
+    for owner, attribute in _targets():
+        # Inherited attributes (pydantic's __init__) are recorded as None and
+        # deleted again on disable so the base class version shows through
+        original = owner.__dict__.get(attribute)
+        target = original if original is not None else getattr(owner, attribute)
+        stats = _calls.setdefault(f"{owner.__name__}.{attribute}", CallStats())
+        if isinstance(target, staticmethod):
+            wrapped: Any = staticmethod(_timed(stats, target.__func__))
+        else:
+            wrapped = _timed(stats, target)
+        _originals.append((owner, attribute, original))
+        setattr(owner, attribute, wrapped)
+
+
+def disable() -> None:
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        if original is None:
+            delattr(owner, attribute)
+        else:
+            setattr(owner, attribute, original)
+
+
+def reset() -> None:
+    _calls.clear()
+    _phases.clear()
+    if _originals:
+        disable()
+        enable()
+
+
+@contextmanager
+def _timed_phase(name: str) -> Iterator[None]:
+    stats = _phases.setdefault(name, CallStats())
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.calls += 1
+        stats.total_time += time.perf_counter() - start
+
+
+def phase(name: str) -> ContextManager[None]:
+    if not _originals:
+        return _null_phase
+    return _timed_phase(name)
+
+
+def stats() -> dict[str, dict[str, dict[str, float]]]:
+    return {
+        "calls": {name: value.as_dict() for name, value in _calls.items()},
+        "phases": {name: value.as_dict() for name, value in _phases.items()},
+    }
+
+
+def stats_json(indent: int = 2) -> str:
+    return json.dumps(stats(), indent=indent)
+
+
+def write_stats(path: str) -> None:
+    with open(path, "w") as stream:
+        stream.write(stats_json())
+
+
+@contextmanager
+def profile(path: str) -> Iterator[cProfile.Profile]:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
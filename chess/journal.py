@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Sequence
+
+from chess.adjudication import FIFTY_MOVE_PLIES, Adjudicator
+from chess.board import STARTING_FEN, Board
+from chess.movegen import CoordinateMove
+from chess.pieces import Piece, PieceType
+from chess.utils import Colour, MoveCategory, other_colour
+from chess.zobrist import PIECE_KIND
+
+JOURNAL_MAGIC = b"CGJ1"
+CHECKPOINT_MAGIC = b"CGC2"
+MOVE = struct.Struct(">H")
+# Plies, side to move, last piece moved, halfmove clock, the board and the
+# captured piece counts
+CHECKPOINT = struct.Struct(">IBBH64s64s10s")
+NO_SQUARE = 0xFF
+
+KIND_PIECE = {kind: piece_type for piece_type, kind in PIECE_KIND.items()}
+CAPTURABLE = (
+    PieceType.PAWN,
+    PieceType.KNIGHT,
+    PieceType.BISHOP,
+    PieceType.ROOK,
+    PieceType.QUEEN,
+)
+PROMOTION_CODE = {piece_type: code for code, piece_type in enumerate(CAPTURABLE)}
+SQUARE_POSITIONS = [(square & 7, square >> 3) for square in range(64)]
+
+
+def encode_move(move: CoordinateMove) -> int:
+    promotion = 0
+    if move.promote_to != PieceType.EMPTY:
+        promotion = PROMOTION_CODE[move.promote_to]
+    origin = move.origin[1] * 8 + move.origin[0]
+    destination = move.destination[1] * 8 + move.destination[0]
+    return promotion << 12 | origin << 6 | destination
+
+
+def decode_move(code: int) -> CoordinateMove:
+    promotion = code >> 12
+    return CoordinateMove(
+        SQUARE_POSITIONS[(code >> 6) & 63],
+        SQUARE_POSITIONS[code & 63],
+        CAPTURABLE[promotion] if promotion else PieceType.EMPTY,
+    )
+
+
+@dataclass
+class JournalState:
+    board: Board
+    colour: Colour
+    plies: int
+    captured: dict[Colour, list[Piece]] = field(
+        default_factory=lambda: {Colour.WHITE: [], Colour.BLACK: []}
+    )
+    halfmove_clock: int = 0
+    # Fed the moves replayed once it is set, so that it carries on with the
+    # positions that may still repeat
+    adjudicator: Optional[Adjudicator] = None
+
+
+def encode_board(board: Board) -> tuple[bytes, bytes, int]:
+    # One byte per square for the piece and one for its move count, with
+    # squares numbered rank * 8 + file, and the square of the last piece moved
+    pieces = bytearray(64)
+    moves_made = bytearray(64)
+    last_moved = NO_SQUARE
+    for (file, rank), square in board.squares.items():
+        piece = square.piece
+        if piece.type == PieceType.EMPTY:
+            continue
+        index = rank * 8 + file
+        pieces[index] = 1 + 2 * PIECE_KIND[piece.type] + (piece.colour == Colour.BLACK)
+        moves_made[index] = min(piece.moves_made, 255)
+        if piece.last_moved:
+            last_moved = index
+    return bytes(pieces), bytes(moves_made), last_moved
+
+
+def decode_board(pieces: bytes, moves_made: bytes, last_moved: int) -> Board:
+    board = Board()
+    for index, code in enumerate(pieces):
+        if not code:
+            continue
+        piece_colour = Colour.BLACK if (code - 1) & 1 else Colour.WHITE
+        piece = Piece.from_type(KIND_PIECE[(code - 1) >> 1], piece_colour)
+        piece.moves_made = moves_made[index]
+        piece.last_moved = index == last_moved
+        if piece.type == PieceType.PAWN and piece.moves_made:
+            piece.move_limit[MoveCategory.REGULAR] = 1
+        board.place(index & 7, index >> 3, piece)
+    return board
+
+
+def _pack_checkpoint(
+    plies: int,
+    board: Board,
+    colour: Colour,
+    captured: dict[Colour, Sequence[Piece]],
+    halfmove_clock: int,
+) -> bytes:
+    pieces, moves_made, last_moved = encode_board(board)
+    counts = bytearray(10)
+    for offset, capturer in ((0, Colour.WHITE), (5, Colour.BLACK)):
+        for piece in captured[capturer]:
+            if piece.type in PROMOTION_CODE:
+                counts[offset + PROMOTION_CODE[piece.type]] += 1
+    return CHECKPOINT.pack(
+        plies,
+        colour == Colour.BLACK,
+        last_moved,
+        min(halfmove_clock, 0xFFFF),
+        pieces,
+        moves_made,
+        bytes(counts),
+    )
+
+
+def _unpack_checkpoint(record: bytes) -> JournalState:
+    plies, black, last_moved, halfmove_clock, pieces, moves_made, counts = (
+        CHECKPOINT.unpack(record)
+    )
+    board = decode_board(pieces, moves_made, last_moved)
+    state = JournalState(board, Colour.BLACK if black else Colour.WHITE, plies)
+    state.halfmove_clock = halfmove_clock
+    for offset, capturer in ((0, Colour.WHITE), (5, Colour.BLACK)):
+        for code, piece_type in enumerate(CAPTURABLE):
+            state.captured[capturer].extend(
+                Piece.from_type(piece_type, other_colour(capturer))
+                for _ in range(counts[offset + code])
+            )
+    return state
+
+
+def replay(state: JournalState, codes: Iterable[int]) -> None:
+    # A trimmed make_move: the journal only holds moves that were already
+    # played legally, and nothing needs to be undone, so no records are kept
+    squares = state.board.squares
+    last_moved: Optional[Piece] = None
+    for square in squares.values():
+        if square.piece.last_moved:
+            last_moved = square.piece
+    colour = state.colour
+    halfmove_clock = state.halfmove_clock
+
+    for code in codes:
+        origin = SQUARE_POSITIONS[(code >> 6) & 63]
+        destination = SQUARE_POSITIONS[code & 63]
+        origin_square = squares[origin]
+        target = squares[destination]
+        piece = origin_square.piece
+        captured = target.piece
+
+        if piece.type == PieceType.PAWN:
+            if origin[0] != destination[0] and captured.type == PieceType.EMPTY:
+                passed = squares[(destination[0], origin[1])]
+                captured = passed.piece
+                passed.piece = Piece.make_empty_piece()
+        elif piece.type == PieceType.KING and abs(destination[0] - origin[0]) == 2:
+            rank = origin[1]
+            rook_origin, rook_destination = (
+                ((7, rank), (5, rank))
+                if destination[0] == 6
+                else ((0, rank), (3, rank))
+            )
+            squares[rook_origin].move_piece(squares[rook_destination])
+            squares[rook_destination].piece.last_moved = False
+
+        origin_square.move_piece(target)
+        if last_moved is not None:
+            last_moved.last_moved = False
+        if code >> 12:
+            promoted = Piece.from_type(CAPTURABLE[code >> 12], piece.colour)
+            promoted.moves_made = piece.moves_made
+            promoted.last_moved = True
+            target.piece = promoted
+        last_moved = target.piece
+
+        if captured.type != PieceType.EMPTY:
+            state.captured[colour].append(captured)
+            halfmove_clock = 0
+        elif piece.type == PieceType.PAWN:
+            halfmove_clock = 0
+        else:
+            halfmove_clock += 1
+        if state.adjudicator is not None:
+            state.adjudicator.update(
+                state.board, decode_move(code), piece.type, captured.type
+            )
+        colour = Colour.BLACK if colour == Colour.WHITE else Colour.WHITE
+
+    state.colour = colour
+    state.halfmove_clock = halfmove_clock
+
+
+def _read_codes(data: bytes) -> array:
+    codes = array("H")
+    codes.frombytes(data[: len(data) - len(data) % 2])
+    if sys.byteorder == "little":
+        codes.byteswap()
+    return codes
+
+
+def load_journal(path: str | os.PathLike[str]) -> JournalState:
+    with open(path, "rb") as stream:
+        if stream.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            raise ValueError(f"{path} is not a game journal")
+        data = stream.read()
+    codes = _read_codes(data)
+
+    records: list[bytes] = []
+    checkpoint_path = f"{os.fspath(path)}.ckpt"
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "rb") as stream:
+            # Checkpoints in an older layout are ignored, and the game is
+            # replayed from the start instead
+            if stream.read(len(CHECKPOINT_MAGIC)) == CHECKPOINT_MAGIC:
+                data = stream.read()
+                records = [
+                    data[offset : offset + CHECKPOINT.size]
+                    for offset in range(
+                        0, len(data) - CHECKPOINT.size + 1, CHECKPOINT.size
+                    )
+                ]
+    # Skip any checkpoint whose moves never reached the disk
+    records = [
+        record for record in records if CHECKPOINT.unpack_from(record)[0] <= len(codes)
+    ]
+
+    # Only positions since the last capture or pawn move can still repeat,
+    # and at most the last fifty moves' worth, as after that the game is
+    # drawn anyway. The replay starts from a checkpoint no later than the
+    # first of them, and the adjudicator only sees the moves from there on
+    tail = max(len(codes) - FIFTY_MOVE_PLIES, 0)
+    state = JournalState(Board.from_fen(STARTING_FEN), Colour.WHITE, 0)
+    if records:
+        latest = _unpack_checkpoint(records[-1])
+        needed = max(latest.plies - latest.halfmove_clock, tail)
+        for record in reversed(records):
+            if CHECKPOINT.unpack_from(record)[0] <= needed:
+                state = _unpack_checkpoint(record)
+                break
+
+    split = max(state.plies, tail)
+    replay(state, codes[state.plies : split])
+    state.adjudicator = Adjudicator(state.board, state.colour)
+    state.adjudicator.halfmove_clock = state.halfmove_clock
+    replay(state, codes[split:])
+    state.plies = len(codes)
+    return state
+
+
+class GameJournal:
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        checkpoint_every: int = 64,
+        flush_every: int = 16,
+        fsync: bool = False,
+    ) -> None:
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.flush_every = flush_every
+        self.fsync = fsync
+
+        self._moves = open(path, "ab")
+        checkpoint_path = f"{os.fspath(path)}.ckpt"
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "rb") as stream:
+                magic = stream.read(len(CHECKPOINT_MAGIC))
+            if magic != CHECKPOINT_MAGIC:
+                # Start checkpoints afresh rather than append to an old layout
+                os.truncate(checkpoint_path, 0)
+        self._checkpoints = open(checkpoint_path, "ab")
+        for stream, magic, record_size in (
+            (self._moves, JOURNAL_MAGIC, MOVE.size),
+            (self._checkpoints, CHECKPOINT_MAGIC, CHECKPOINT.size),
+        ):
+            size = stream.tell()
+            if size == 0:
+                stream.write(magic)
+            elif (size - len(magic)) % record_size:
+                # Drop a record that was torn by a crash halfway through a write
+                stream.truncate(size - (size - len(magic)) % record_size)
+        self.plies = (self._moves.tell() - len(JOURNAL_MAGIC)) // MOVE.size
+        self._buffer = bytearray()
+        self._pending = 0
+
+    @property
+    def checkpoint_due(self) -> bool:
+        return self.plies % self.checkpoint_every == 0
+
+    def record(self, move: CoordinateMove) -> None:
+        self._buffer += MOVE.pack(encode_move(move))
+        self.plies += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def checkpoint(
+        self,
+        board: Board,
+        colour: Colour,
+        captured: dict[Colour, Sequence[Piece]],
+        halfmove_clock: int = 0,
+    ) -> None:
+        self.flush()
+        self._checkpoints.write(
+            _pack_checkpoint(self.plies, board, colour, captured, halfmove_clock)
+        )
+        self._checkpoints.flush()
+        if self.fsync:
+            os.fsync(self._checkpoints.fileno())
+
+    def truncate(self, plies: int) -> None:
+        # Taken back moves are cut off, with any checkpoints taken after them
+        self.flush()
+        self._moves.truncate(len(JOURNAL_MAGIC) + plies * MOVE.size)
+        self._moves.seek(0, os.SEEK_END)
+        self.plies = plies
+
+        size = self._checkpoints.tell()
+        with open(self._checkpoints.name, "rb") as stream:
+            while size > len(CHECKPOINT_MAGIC):
+                stream.seek(size - CHECKPOINT.size)
+                if CHECKPOINT.unpack_from(stream.read(CHECKPOINT.size))[0] <= plies:
+                    break
+                size -= CHECKPOINT.size
+        self._checkpoints.truncate(size)
+        self._checkpoints.seek(0, os.SEEK_END)
+        if self.fsync:
+            os.fsync(self._moves.fileno())
+            os.fsync(self._checkpoints.fileno())
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._moves.write(self._buffer)
+            self._buffer.clear()
+        self._pending = 0
+        self._moves.flush()
+        if self.fsync:
+            os.fsync(self._moves.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        self._moves.close()
+        self._checkpoints.close()
+
+    def __enter__(self) -> GameJournal:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -5,24 +5,12 @@ from typing import Literal, Optional, Protocol
 import pydantic
 
 from chess.exceptions import Checkmate, IllegalMoveError, NotationError
-from chess.pieces import FEN_MAP, PieceType
+from chess.movegen import CoordinateMove, is_legal
+from chess.pieces import FEN_MAP, Piece, PieceType
 from chess.players import Player
 from chess.square import Square
 from chess.utils import Colour, MoveCategory, other_colour
 
-notation_map = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
-
-int_str_file_map = {0: "a", 1: "b", 2: "c", 3: "d", 4: "e", 5: "f", 6: "g", 7: "h"}
-int_str_rank_map = {0: "1", 1: "2", 2: "3", 3: "4", 4: "5", 5: "6", 6: "7", 7: "8"}
-str_int_file_map = {string: integer for integer, string in int_str_file_map.items()}
-str_int_rank_map = {string: integer for integer, string in int_str_rank_map.items()}
-
-position_map = {
-    (str_file, str_rank): (int_file, int_rank)
-    for int_file, str_file in int_str_file_map.items()
-    for int_rank, str_rank in int_str_rank_map.items()
-}
-
 
 class Board(Protocol):
     def get_square(self, file: int, rank: int) -> Square:
@@ -108,30 +96,28 @@ class Move(pydantic.BaseModel):
             if board.king_is_in_check(self.player.colour):
                 raise IllegalMoveError("You cannot castle out of check!")
 
-        en_passant = False
+        if not is_legal(
+            board,
+            CoordinateMove(
+                (source.file, source.rank),
+                (self.destination.file, self.destination.rank),
+            ),
+            self.player.colour,
+        ):
+            raise IllegalMoveError("Your king is in check!")
+
         en_passanted_square = board.get_square(self.destination.file, source.rank)
 
         if self.move_category == MoveCategory.CAPTURE:
             if self.destination.is_empty:
-                en_passant = True
                 captured_piece = en_passanted_square.piece
-                en_passanted_square.empty()
+                en_passanted_square.piece = Piece.make_empty_piece()
             else:
                 captured_piece = self.destination.piece
             self.player.pieces_captured.append(captured_piece)
 
         source.move_piece(self.destination)
 
-        if board.king_is_in_check(self.player.colour):
-            self.destination.move_piece(source, undo=True)
-            if self.move_category == MoveCategory.CAPTURE:
-                if en_passant:
-                    en_passanted_square.piece = self.player.pieces_captured.pop()
-                else:
-                    self.destination.piece = self.player.pieces_captured.pop()
-                self.player.pieces_captured.pop()
-            raise IllegalMoveError("Your king is in check!")
-
         if (
             self.castle_rook_origin is not None
             and self.castle_rook_destination is not None
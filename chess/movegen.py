@@ -0,0 +1,681 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, Optional
+
+from chess.exceptions import NotationError
+from chess.pieces import FEN_MAP, Piece, PieceType
+from chess.utils import (
+    Colour,
+    MoveCategory,
+    int_str_file_map,
+    int_str_rank_map,
+    other_colour,
+    position_map,
+)
+
+if TYPE_CHECKING:
+    from chess.board import Board, Position
+
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+KING_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+KNIGHT_JUMPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+
+SLIDING_DIRECTIONS: dict[PieceType, tuple[tuple[int, int], ...]] = {
+    PieceType.ROOK: ROOK_DIRECTIONS,
+    PieceType.BISHOP: BISHOP_DIRECTIONS,
+    PieceType.QUEEN: KING_DIRECTIONS,
+}
+
+PAWN_DIRECTION = {Colour.WHITE: 1, Colour.BLACK: -1}
+PAWN_START_RANK = {Colour.WHITE: 1, Colour.BLACK: 6}
+PROMOTION_RANK = {Colour.WHITE: 7, Colour.BLACK: 0}
+BACK_RANK = {Colour.WHITE: 0, Colour.BLACK: 7}
+PROMOTION_PIECES = (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT)
+
+PIECE_LETTER: dict[PieceType, str] = {
+    piece_type: letter.upper()
+    for letter, piece_type in FEN_MAP.items()
+    if piece_type != PieceType.PAWN
+}
+
+_EMPTY = Piece.make_empty_piece()
+
+
+def square_name(position: Position) -> str:
+    return int_str_file_map[position[0]] + int_str_rank_map[position[1]]
+
+
+@dataclass(frozen=True)
+class CoordinateMove:
+    origin: Position
+    destination: Position
+    promote_to: PieceType = PieceType.EMPTY
+
+    def uci(self) -> str:
+        promotion = (
+            ""
+            if self.promote_to == PieceType.EMPTY
+            else PIECE_LETTER[self.promote_to].lower()
+        )
+        return square_name(self.origin) + square_name(self.destination) + promotion
+
+
+@dataclass
+class MoveRecord:
+    move: CoordinateMove
+    piece: Piece
+    captured: Piece
+    captured_at: Position
+    previous_last_moved: Optional[Piece] = None
+    rook_origin: Optional[Position] = None
+    rook_destination: Optional[Position] = None
+
+
+@dataclass
+class CheckInfo:
+    king: Position
+    checkers: list[Position]
+    evasions: set[Position]
+    pins: dict[Position, set[Position]]
+
+
+def find_king_position(board: Board, colour: Colour) -> Position:
+    for position, square in board.squares.items():
+        piece = square.piece
+        if piece.type == PieceType.KING and piece.colour == colour:
+            return position
+    raise ValueError(f"There is no {colour} king on the board")
+
+
+def is_attacked(board: Board, position: Position, by_colour: Colour) -> bool:
+    squares = board.squares
+    file, rank = position
+
+    for df, dr in KNIGHT_JUMPS:
+        square = squares.get((file + df, rank + dr))
+        if (
+            square is not None
+            and square.piece.type == PieceType.KNIGHT
+            and square.piece.colour == by_colour
+        ):
+            return True
+
+    for df, dr in KING_DIRECTIONS:
+        square = squares.get((file + df, rank + dr))
+        if (
+            square is not None
+            and square.piece.type == PieceType.KING
+            and square.piece.colour == by_colour
+        ):
+            return True
+
+    pawn_rank = rank - PAWN_DIRECTION[by_colour]
+    for df in (-1, 1):
+        square = squares.get((file + df, pawn_rank))
+        if (
+            square is not None
+            and square.piece.type == PieceType.PAWN
+            and square.piece.colour == by_colour
+        ):
+            return True
+
+    for directions, slider in (
+        (ROOK_DIRECTIONS, PieceType.ROOK),
+        (BISHOP_DIRECTIONS, PieceType.BISHOP),
+    ):
+        for df, dr in directions:
+            target_file, target_rank = file + df, rank + dr
+            while True:
+                square = squares.get((target_file, target_rank))
+                if square is None:
+                    break
+                piece = square.piece
+                if piece.type != PieceType.EMPTY:
+                    if piece.colour == by_colour and (
+                        piece.type == slider or piece.type == PieceType.QUEEN
+                    ):
+                        return True
+                    break
+                target_file += df
+                target_rank += dr
+
+    return False
+
+
+def attackers(board: Board, position: Position, by_colour: Colour) -> list[Position]:
+    squares = board.squares
+    file, rank = position
+    found: list[Position] = []
+
+    for steps, piece_type in (
+        (KNIGHT_JUMPS, PieceType.KNIGHT),
+        (KING_DIRECTIONS, PieceType.KING),
+    ):
+        for df, dr in steps:
+            origin = (file + df, rank + dr)
+            square = squares.get(origin)
+            if (
+                square is not None
+                and square.piece.type == piece_type
+                and square.piece.colour == by_colour
+            ):
+                found.append(origin)
+
+    pawn_rank = rank - PAWN_DIRECTION[by_colour]
+    for df in (-1, 1):
+        origin = (file + df, pawn_rank)
+        square = squares.get(origin)
+        if (
+            square is not None
+            and square.piece.type == PieceType.PAWN
+            and square.piece.colour == by_colour
+        ):
+            found.append(origin)
+
+    for directions, slider in (
+        (ROOK_DIRECTIONS, PieceType.ROOK),
+        (BISHOP_DIRECTIONS, PieceType.BISHOP),
+    ):
+        for df, dr in directions:
+            origin = (file + df, rank + dr)
+            while True:
+                square = squares.get(origin)
+                if square is None:
+                    break
+                piece = square.piece
+                if piece.type != PieceType.EMPTY:
+                    if piece.colour == by_colour and (
+                        piece.type == slider or piece.type == PieceType.QUEEN
+                    ):
+                        found.append(origin)
+                    break
+                origin = (origin[0] + df, origin[1] + dr)
+
+    return found
+
+
+def in_check(board: Board, colour: Colour) -> bool:
+    return is_attacked(board, find_king_position(board, colour), other_colour(colour))
+
+
+def check_info(board: Board, colour: Colour) -> CheckInfo:
+    squares = board.squares
+    king = find_king_position(board, colour)
+    opponent = other_colour(colour)
+    file, rank = king
+    checkers: list[Position] = []
+    evasions: set[Position] = set()
+    pins: dict[Position, set[Position]] = {}
+
+    for df, dr in KNIGHT_JUMPS:
+        position = (file + df, rank + dr)
+        square = squares.get(position)
+        if (
+            square is not None
+            and square.piece.type == PieceType.KNIGHT
+            and square.piece.colour == opponent
+        ):
+            checkers.append(position)
+            evasions.add(position)
+
+    pawn_rank = rank + PAWN_DIRECTION[colour]
+    for df in (-1, 1):
+        position = (file + df, pawn_rank)
+        square = squares.get(position)
+        if (
+            square is not None
+            and square.piece.type == PieceType.PAWN
+            and square.piece.colour == opponent
+        ):
+            checkers.append(position)
+            evasions.add(position)
+
+    for directions, slider in (
+        (ROOK_DIRECTIONS, PieceType.ROOK),
+        (BISHOP_DIRECTIONS, PieceType.BISHOP),
+    ):
+        for df, dr in directions:
+            ray: list[Position] = []
+            pinned: Optional[Position] = None
+            position = (file + df, rank + dr)
+            while True:
+                square = squares.get(position)
+                if square is None:
+                    break
+                ray.append(position)
+                piece = square.piece
+                if piece.type != PieceType.EMPTY:
+                    if piece.colour == colour:
+                        if pinned is not None:
+                            break
+                        pinned = position
+                    else:
+                        if piece.type == slider or piece.type == PieceType.QUEEN:
+                            if pinned is None:
+                                checkers.append(position)
+                                evasions.update(ray)
+                            else:
+                                pins[pinned] = set(ray)
+                        break
+                position = (position[0] + df, position[1] + dr)
+
+    return CheckInfo(king, checkers, evasions, pins)
+
+
+def en_passant_target(board: Board, colour: Colour) -> Optional[Position]:
+    opponent = other_colour(colour)
+    rank = PAWN_START_RANK[opponent] + 2 * PAWN_DIRECTION[opponent]
+    for file in range(8):
+        piece = board.squares[(file, rank)].piece
+        if (
+            piece.type == PieceType.PAWN
+            and piece.colour == opponent
+            and piece.moves_made == 1
+            and piece.last_moved
+        ):
+            return (file, rank - PAWN_DIRECTION[opponent])
+    return None
+
+
+def can_castle(
+    board: Board,
+    colour: Colour,
+    move_category: Literal[MoveCategory.SHORT_CASTLE, MoveCategory.LONG_CASTLE],
+) -> bool:
+    back_rank = BACK_RANK[colour]
+    king = board.squares[(4, back_rank)].piece
+    rook_file = 7 if move_category == MoveCategory.SHORT_CASTLE else 0
+    rook = board.squares[(rook_file, back_rank)].piece
+    return (
+        king.type == PieceType.KING
+        and king.colour == colour
+        and not king.has_moved
+        and rook.type == PieceType.ROOK
+        and rook.colour == colour
+        and not rook.has_moved
+    )
+
+
+def _castling_moves(board: Board, colour: Colour) -> list[CoordinateMove]:
+    back_rank = BACK_RANK[colour]
+    opponent = other_colour(colour)
+    squares = board.squares
+    moves: list[CoordinateMove] = []
+
+    short = can_castle(board, colour, MoveCategory.SHORT_CASTLE)
+    long = can_castle(board, colour, MoveCategory.LONG_CASTLE)
+    if not (short or long) or is_attacked(board, (4, back_rank), opponent):
+        return moves
+
+    if (
+        short
+        and squares[(5, back_rank)].is_empty
+        and squares[(6, back_rank)].is_empty
+        and not is_attacked(board, (5, back_rank), opponent)
+        and not is_attacked(board, (6, back_rank), opponent)
+    ):
+        moves.append(CoordinateMove((4, back_rank), (6, back_rank)))
+
+    if (
+        long
+        and squares[(3, back_rank)].is_empty
+        and squares[(2, back_rank)].is_empty
+        and squares[(1, back_rank)].is_empty
+        and not is_attacked(board, (3, back_rank), opponent)
+        and not is_attacked(board, (2, back_rank), opponent)
+    ):
+        moves.append(CoordinateMove((4, back_rank), (2, back_rank)))
+
+    return moves
+
+
+def _pawn_moves(
+    board: Board,
+    origin: Position,
+    colour: Colour,
+    en_passant: Optional[Position],
+    moves: list[CoordinateMove],
+) -> None:
+    squares = board.squares
+    file, rank = origin
+    direction = PAWN_DIRECTION[colour]
+    promotion_rank = PROMOTION_RANK[colour]
+
+    def add(destination: Position) -> None:
+        if destination[1] == promotion_rank:
+            for piece_type in PROMOTION_PIECES:
+                moves.append(CoordinateMove(origin, destination, piece_type))
+        else:
+            moves.append(CoordinateMove(origin, destination))
+
+    forward = (file, rank + direction)
+    square = squares.get(forward)
+    if square is not None and square.is_empty:
+        add(forward)
+        if rank == PAWN_START_RANK[colour]:
+            double = (file, rank + 2 * direction)
+            if squares[double].is_empty:
+                moves.append(CoordinateMove(origin, double))
+
+    for df in (-1, 1):
+        target = (file + df, rank + direction)
+        square = squares.get(target)
+        if square is None:
+            continue
+        if square.piece.type != PieceType.EMPTY and square.piece.colour != colour:
+            add(target)
+        elif target == en_passant:
+            moves.append(CoordinateMove(origin, target))
+
+
+def pseudo_legal_moves(board: Board, colour: Colour) -> list[CoordinateMove]:
+    squares = board.squares
+    en_passant = en_passant_target(board, colour)
+    moves: list[CoordinateMove] = []
+
+    for origin, square in squares.items():
+        piece = square.piece
+        if piece.colour != colour:
+            continue
+        piece_type = piece.type
+        file, rank = origin
+
+        if piece_type == PieceType.PAWN:
+            _pawn_moves(board, origin, colour, en_passant, moves)
+        elif piece_type == PieceType.KNIGHT or piece_type == PieceType.KING:
+            steps = KNIGHT_JUMPS if piece_type == PieceType.KNIGHT else KING_DIRECTIONS
+            for df, dr in steps:
+                destination = (file + df, rank + dr)
+                target = squares.get(destination)
+                if target is not None and target.piece.colour != colour:
+                    moves.append(CoordinateMove(origin, destination))
+        else:
+            for df, dr in SLIDING_DIRECTIONS[piece_type]:
+                target_file, target_rank = file + df, rank + dr
+                while True:
+                    target = squares.get((target_file, target_rank))
+                    if target is None:
+                        break
+                    if target.piece.type == PieceType.EMPTY:
+                        moves.append(CoordinateMove(origin, (target_file, target_rank)))
+                    else:
+                        if target.piece.colour != colour:
+                            moves.append(
+                                CoordinateMove(origin, (target_file, target_rank))
+                            )
+                        break
+                    target_file += df
+                    target_rank += dr
+
+    moves.extend(_castling_moves(board, colour))
+    return moves
+
+
+def leaves_king_in_check(board: Board, move: CoordinateMove, colour: Colour) -> bool:
+    squares = board.squares
+    origin = squares[move.origin]
+    destination = squares[move.destination]
+    moving = origin.piece
+    captured = destination.piece
+
+    en_passant_square = None
+    if (
+        moving.type == PieceType.PAWN
+        and move.origin[0] != move.destination[0]
+        and captured.type == PieceType.EMPTY
+    ):
+        en_passant_square = squares[(move.destination[0], move.origin[1])]
+        en_passant_piece = en_passant_square.piece
+        en_passant_square.piece = _EMPTY
+
+    destination.piece = moving
+    origin.piece = _EMPTY
+    king = (
+        move.destination
+        if moving.type == PieceType.KING
+        else find_king_position(board, colour)
+    )
+    attacked = is_attacked(board, king, other_colour(colour))
+    origin.piece = moving
+    destination.piece = captured
+    if en_passant_square is not None:
+        en_passant_square.piece = en_passant_piece
+    return attacked
+
+
+def is_legal(
+    board: Board,
+    move: CoordinateMove,
+    colour: Colour,
+    info: Optional[CheckInfo] = None,
+) -> bool:
+    if info is None:
+        info = check_info(board, colour)
+    squares = board.squares
+    piece = squares[move.origin].piece
+    # King moves and en passant can uncover attacks that the pins and
+    # checkers don't describe, so they are still tried on the board
+    if piece.type == PieceType.KING or (
+        piece.type == PieceType.PAWN
+        and move.origin[0] != move.destination[0]
+        and squares[move.destination].piece.type == PieceType.EMPTY
+    ):
+        return not leaves_king_in_check(board, move, colour)
+
+    if info.checkers:
+        if len(info.checkers) > 1 or move.destination not in info.evasions:
+            return False
+    pin = info.pins.get(move.origin)
+    return pin is None or move.destination in pin
+
+
+def legal_moves(board: Board, colour: Colour) -> list[CoordinateMove]:
+    info = check_info(board, colour)
+    return [
+        move
+        for move in pseudo_legal_moves(board, colour)
+        if is_legal(board, move, colour, info)
+    ]
+
+
+def is_capture(board: Board, move: CoordinateMove) -> bool:
+    squares = board.squares
+    if not squares[move.destination].is_empty:
+        return True
+    return (
+        squares[move.origin].piece.type == PieceType.PAWN
+        and move.origin[0] != move.destination[0]
+    )
+
+
+def move_record(board: Board, move: CoordinateMove) -> MoveRecord:
+    squares = board.squares
+    piece = squares[move.origin].piece
+
+    previous_last_moved = None
+    for square in squares.values():
+        if square.piece.last_moved:
+            previous_last_moved = square.piece
+            break
+
+    captured_at = move.destination
+    captured = squares[move.destination].piece
+    if (
+        piece.type == PieceType.PAWN
+        and move.origin[0] != move.destination[0]
+        and captured.type == PieceType.EMPTY
+    ):
+        captured_at = (move.destination[0], move.origin[1])
+        captured = squares[captured_at].piece
+
+    record = MoveRecord(move, piece, captured, captured_at, previous_last_moved)
+    if piece.type == PieceType.KING and abs(move.destination[0] - move.origin[0]) == 2:
+        rank = move.origin[1]
+        short = move.destination[0] == 6
+        record.rook_origin = (7, rank) if short else (0, rank)
+        record.rook_destination = (5, rank) if short else (3, rank)
+    return record
+
+
+def make_move(board: Board, move: CoordinateMove) -> MoveRecord:
+    record = move_record(board, move)
+    squares = board.squares
+    destination = squares[move.destination]
+    piece = record.piece
+
+    if record.captured_at != move.destination:
+        squares[record.captured_at].piece = Piece.make_empty_piece()
+
+    squares[move.origin].move_piece(destination)
+    if (
+        record.previous_last_moved is not None
+        and record.previous_last_moved is not piece
+    ):
+        record.previous_last_moved.last_moved = False
+
+    if move.promote_to != PieceType.EMPTY:
+        promoted = Piece.from_type(move.promote_to, piece.colour)
+        promoted.moves_made = piece.moves_made
+        promoted.last_moved = True
+        destination.piece = promoted
+
+    if record.rook_origin is not None and record.rook_destination is not None:
+        rook_square = squares[record.rook_destination]
+        squares[record.rook_origin].move_piece(rook_square)
+        rook_square.piece.last_moved = False
+
+    return record
+
+
+def make_null_move(board: Board) -> Optional[Piece]:
+    # Passing only takes away the opponent's chance to capture en passant,
+    # which depends on the last piece moved; it is returned for the undo
+    for square in board.squares.values():
+        if square.piece.last_moved:
+            square.piece.last_moved = False
+            return square.piece
+    return None
+
+
+def unmake_null_move(last_moved: Optional[Piece]) -> None:
+    if last_moved is not None:
+        last_moved.last_moved = True
+
+
+def unmake_move(board: Board, record: MoveRecord) -> None:
+    squares = board.squares
+    move = record.move
+
+    if record.rook_origin is not None and record.rook_destination is not None:
+        squares[record.rook_destination].move_piece(
+            squares[record.rook_origin], undo=True
+        )
+
+    destination = squares[move.destination]
+    destination.piece = record.piece
+    destination.move_piece(squares[move.origin], undo=True)
+    squares[record.captured_at].piece = record.captured
+
+    if record.previous_last_moved is not None:
+        record.previous_last_moved.last_moved = True
+
+
+def perft(board: Board, colour: Colour, depth: int) -> int:
+    # Leaf positions depth plies ahead; the last ply is counted, not played
+    if depth <= 0:
+        return 1
+    moves = legal_moves(board, colour)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        record = make_move(board, move)
+        try:
+            nodes += perft(board, other_colour(colour), depth - 1)
+        finally:
+            unmake_move(board, record)
+    return nodes
+
+
+def san(
+    board: Board,
+    move: CoordinateMove,
+    colour: Colour,
+    check_suffix: bool = True,
+) -> str:
+    squares = board.squares
+    piece = squares[move.origin].piece
+
+    if piece.type == PieceType.KING and abs(move.destination[0] - move.origin[0]) == 2:
+        text = "O-O" if move.destination[0] == 6 else "O-O-O"
+    elif piece.type == PieceType.PAWN:
+        text = ""
+        if move.origin[0] != move.destination[0]:
+            text = int_str_file_map[move.origin[0]] + "x"
+        text += square_name(move.destination)
+        if move.promote_to != PieceType.EMPTY:
+            text += "=" + PIECE_LETTER[move.promote_to]
+    else:
+        rivals = [
+            other.origin
+            for other in legal_moves(board, colour)
+            if other.destination == move.destination
+            and other.origin != move.origin
+            and squares[other.origin].piece.type == piece.type
+        ]
+        disambiguation = ""
+        if rivals:
+            if all(origin[0] != move.origin[0] for origin in rivals):
+                disambiguation = int_str_file_map[move.origin[0]]
+            elif all(origin[1] != move.origin[1] for origin in rivals):
+                disambiguation = int_str_rank_map[move.origin[1]]
+            else:
+                disambiguation = square_name(move.origin)
+        capture = "x" if not squares[move.destination].is_empty else ""
+        text = PIECE_LETTER[piece.type] + disambiguation + capture
+        text += square_name(move.destination)
+
+    if check_suffix:
+        record = make_move(board, move)
+        opponent = other_colour(colour)
+        if in_check(board, opponent):
+            text += "+" if legal_moves(board, opponent) else "#"
+        unmake_move(board, record)
+
+    return text
+
+
+def parse_san(board: Board, text: str, colour: Colour) -> CoordinateMove:
+    cleaned = text.rstrip("+#!?").replace("0", "O")
+    if len(cleaned) > 2 and cleaned[-1] in "QRBN" and cleaned[-2] != "=":
+        if cleaned[0].islower():
+            cleaned = cleaned[:-1] + "=" + cleaned[-1]
+
+    moves = legal_moves(board, colour)
+    if not cleaned.startswith("O"):
+        # Only moves to the square the text names can match it, which spares
+        # rendering the rest, each with its own move generation
+        square = cleaned.split("=")[0][-2:]
+        destination = position_map.get((square[:1], square[1:]))
+        moves = [move for move in moves if move.destination == destination]
+    for move in moves:
+        if san(board, move, colour, check_suffix=False) == cleaned:
+            return move
+    raise NotationError(f"{text} is not a legal move in this position")
+
+
+def parse_uci(text: str) -> CoordinateMove:
+    try:
+        origin = position_map[(text[0], text[1])]
+        destination = position_map[(text[2], text[3])]
+    except (IndexError, KeyError) as err:
+        raise NotationError(f"{text} is not a valid coordinate move") from err
+    promote_to = PieceType.EMPTY
+    if len(text) == 5:
+        try:
+            promote_to = FEN_MAP[text[4].lower()]
+        except KeyError as err:
+            raise NotationError(f"{text} is not a valid coordinate move") from err
+    return CoordinateMove(origin, destination, promote_to)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from chess.pieces import PieceType
+from chess.utils import Colour
+from chess.zobrist import type_key
+
+if TYPE_CHECKING:
+    from chess.board import Board, Position
+    from chess.movegen import MoveRecord
+
+DOUBLED_PAWN = 12
+ISOLATED_PAWN = 12
+# By rank counted from the pawn's own side, so index 6 is one step from queening
+PASSED_PAWN = (0, 5, 10, 20, 35, 60, 100, 0)
+SHIELD_PAWN = 10
+
+FILE_MASKS = [sum(1 << (rank * 8 + file) for rank in range(8)) for file in range(8)]
+ADJACENT_FILES = [
+    (FILE_MASKS[file - 1] if file > 0 else 0)
+    | (FILE_MASKS[file + 1] if file < 7 else 0)
+    for file in range(8)
+]
+
+
+def _ahead(colour: Colour, rank: int) -> int:
+    ranks = range(rank + 1, 8) if colour == Colour.WHITE else range(rank)
+    return sum(0xFF << (8 * ahead) for ahead in ranks)
+
+
+# Squares that must be free of enemy pawns for a pawn on a square to be passed
+PASSED_SPANS = {
+    colour: [
+        (FILE_MASKS[square & 7] | ADJACENT_FILES[square & 7])
+        & _ahead(colour, square >> 3)
+        for square in range(64)
+    ]
+    for colour in (Colour.WHITE, Colour.BLACK)
+}
+
+
+@dataclass
+class PawnEntry:
+    key: int
+    # From White's point of view, without the king shield, which also
+    # depends on where the kings stand
+    score: int
+    pawns: dict[Colour, int]
+    passed: dict[Colour, int]
+
+
+def pawn_key(board: Board) -> int:
+    key = 0
+    for (file, rank), square in board.squares.items():
+        if square.piece.type == PieceType.PAWN:
+            key ^= type_key(PieceType.PAWN, square.piece.colour, file, rank)
+    return key
+
+
+def pawn_key_change(record: MoveRecord) -> int:
+    # XORing the result in makes the move, and XORing it in again undoes it
+    key = 0
+    piece = record.piece
+    move = record.move
+    if piece.type == PieceType.PAWN:
+        key ^= type_key(PieceType.PAWN, piece.colour, *move.origin)
+        if move.promote_to == PieceType.EMPTY:
+            key ^= type_key(PieceType.PAWN, piece.colour, *move.destination)
+    if record.captured.type == PieceType.PAWN:
+        key ^= type_key(PieceType.PAWN, record.captured.colour, *record.captured_at)
+    return key
+
+
+def pawn_structure(board: Board, key: int = 0) -> PawnEntry:
+    pawns = {Colour.WHITE: 0, Colour.BLACK: 0}
+    for (file, rank), square in board.squares.items():
+        if square.piece.type == PieceType.PAWN:
+            pawns[square.piece.colour] |= 1 << (rank * 8 + file)
+
+    score = 0
+    passed = {Colour.WHITE: 0, Colour.BLACK: 0}
+    for colour, opponent, sign in (
+        (Colour.WHITE, Colour.BLACK, 1),
+        (Colour.BLACK, Colour.WHITE, -1),
+    ):
+        own = pawns[colour]
+        for file in range(8):
+            count = bin(own & FILE_MASKS[file]).count("1")
+            if count > 1:
+                score -= sign * DOUBLED_PAWN * (count - 1)
+            if count and not own & ADJACENT_FILES[file]:
+                score -= sign * ISOLATED_PAWN * count
+
+        remaining = own
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            square = bit.bit_length() - 1
+            if not pawns[opponent] & PASSED_SPANS[colour][square]:
+                passed[colour] |= bit
+                rank = square >> 3
+                score += sign * PASSED_PAWN[rank if sign > 0 else 7 - rank]
+    return PawnEntry(key, score, pawns, passed)
+
+
+def king_shield(entry: PawnEntry, kings: dict[Colour, Position]) -> int:
+    # Own pawns in front of a king still on its back rank, worth half as
+    # much a rank further up
+    score = 0
+    for colour, sign, home, step in (
+        (Colour.WHITE, 1, 0, 1),
+        (Colour.BLACK, -1, 7, -1),
+    ):
+        king = kings.get(colour)
+        if king is None or king[1] != home:
+            continue
+        own = entry.pawns[colour]
+        for file in range(max(king[0] - 1, 0), min(king[0] + 2, 8)):
+            if own >> ((home + step) * 8 + file) & 1:
+                score += sign * SHIELD_PAWN
+            elif own >> ((home + 2 * step) * 8 + file) & 1:
+                score += sign * SHIELD_PAWN // 2
+    return score
+
+
+class PawnTable:
+    def __init__(self, size: int = 1 << 14) -> None:
+        self.size = size
+        self.slots: list[Optional[PawnEntry]] = [None] * size
+        self.probes = 0
+        self.hits = 0
+        self.compute_time = 0.0
+
+    def get(self, board: Board, key: int) -> PawnEntry:
+        self.probes += 1
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        start = time.perf_counter()
+        entry = pawn_structure(board, key)
+        self.compute_time += time.perf_counter() - start
+        self.slots[index] = entry
+        return entry
+
+    def stats(self) -> dict[str, float]:
+        # Time saved is estimated as each hit sparing a mean miss
+        misses = self.probes - self.hits
+        mean_miss = self.compute_time / misses if misses else 0.0
+        return {
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "compute_time": self.compute_time,
+            "saved_time": self.hits * mean_miss,
+        }
+
+    def clear(self) -> None:
+        self.slots = [None] * self.size
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, TextIO
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+_HEADER = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+_TOKEN = re.compile(
+    r"""
+    (?P<comment>\{[^}]*\}|;[^\n]*)
+    | (?P<open>\()
+    | (?P<close>\))
+    | (?P<nag>\$\d+)
+    | (?P<number>\d+\.+)
+    | (?P<result>1-0|0-1|1/2-1/2|\*)
+    | (?P<san>[A-Za-z0-9][A-Za-z0-9=+#!?/-]*)
+    """,
+    re.VERBOSE,
+)
+
+
+@dataclass
+class PgnGame:
+    headers: dict[str, str] = field(default_factory=dict)
+    moves: list[str] = field(default_factory=list)
+    result: str = "*"
+
+
+def parse_movetext(movetext: str) -> tuple[list[str], str]:
+    moves: list[str] = []
+    result = "*"
+    depth = 0
+    for token in _TOKEN.finditer(movetext):
+        kind = token.lastgroup
+        if kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth = max(depth - 1, 0)
+        elif depth:
+            continue
+        elif kind == "result":
+            result = token.group()
+        elif kind == "san":
+            moves.append(token.group())
+    return moves, result
+
+
+def read_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    headers: dict[str, str] = {}
+    movetext: list[str] = []
+
+    def finish() -> PgnGame:
+        moves, result = parse_movetext(" ".join(movetext))
+        return PgnGame(dict(headers), moves, headers.get("Result", result))
+
+    for line in lines:
+        stripped = line.strip()
+        match = _HEADER.match(stripped)
+        if match:
+            if movetext:
+                yield finish()
+                headers.clear()
+                movetext.clear()
+            headers[match.group(1)] = match.group(2)
+        elif stripped:
+            movetext.append(stripped)
+            if stripped.split()[-1] in RESULTS:
+                yield finish()
+                headers.clear()
+                movetext.clear()
+
+    if movetext or headers:
+        yield finish()
+
+
+def write_game(stream: TextIO, game: PgnGame) -> None:
+    for name, value in game.headers.items():
+        stream.write(f'[{name} "{value}"]\n')
+    if game.headers:
+        stream.write("\n")
+    tokens: list[str] = []
+    for index, move in enumerate(game.moves):
+        if index % 2 == 0:
+            tokens.append(f"{index // 2 + 1}.")
+        tokens.append(move)
+    tokens.append(game.result)
+    stream.write(" ".join(tokens) + "\n\n")
@@ -68,7 +68,10 @@ class Piece:
     def from_fen(cls, fen: str) -> Self:
         type = FEN_MAP[fen.lower()]
         colour = Colour.WHITE if fen.islower() else Colour.BLACK
+        return cls.from_type(type, colour)
 
+    @classmethod
+    def from_type(cls, type: PieceType, colour: Colour) -> Self:
         if type == PieceType.PAWN:
             move_limit = {
                 MoveCategory.CAPTURE: 1,
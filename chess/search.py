@@ -0,0 +1,601 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional, Protocol
+
+from chess.movegen import (
+    CoordinateMove,
+    MoveRecord,
+    attackers,
+    check_info,
+    in_check,
+    is_capture,
+    is_legal,
+    legal_moves,
+    make_move,
+    make_null_move,
+    pseudo_legal_moves,
+    unmake_move,
+    unmake_null_move,
+)
+from chess.pawns import (
+    PawnEntry,
+    PawnTable,
+    king_shield,
+    pawn_key,
+    pawn_key_change,
+    pawn_structure,
+)
+from chess.pieces import Piece, PieceType
+from chess.tablebase import Tablebase, TablebaseResult, Wdl
+from chess.utils import Colour, other_colour
+from chess.zobrist import polyglot_key
+
+if TYPE_CHECKING:
+    from threading import Event
+
+    from chess.board import Board
+    from chess.clock import MoveTimer
+
+MAX_DEPTH = 64
+MATE_SCORE = 100_000
+MATE_BOUND = MATE_SCORE - 1_000
+INFINITY = 1_000_000
+
+# Null moves are searched this much shallower, and only from this depth up
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+# Quiet moves after this many are searched one ply shallower, or two past
+# LATE_MOVE_DOUBLE, from this depth up, and again at full depth if they beat
+# alpha
+LATE_MOVE_COUNT = 3
+LATE_MOVE_DOUBLE = 8
+LATE_MOVE_MIN_DEPTH = 3
+# Nodes between checks of the stop event and deadline: a node costs far more
+# than a check, and a coarser interval overshoots millisecond time limits
+CHECK_INTERVAL = 16
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+PIECE_SCORE: dict[PieceType, int] = {
+    PieceType.EMPTY: 0,
+    PieceType.PAWN: 100,
+    PieceType.KNIGHT: 320,
+    PieceType.BISHOP: 330,
+    PieceType.ROOK: 500,
+    PieceType.QUEEN: 900,
+    PieceType.KING: 0,
+}
+
+# Exchange values: the king only ever recaptures last, so it outweighs the rest
+SEE_VALUE: dict[PieceType, int] = {**PIECE_SCORE, PieceType.KING: 20_000}
+
+CENTRE_BONUS: dict[tuple[int, int], int] = {
+    (file, rank): 10 - 3 * int(max(abs(file - 3.5), abs(rank - 3.5)))
+    for file in range(8)
+    for rank in range(8)
+}
+
+
+def evaluate(board: Board, colour: Colour, pawns: Optional[PawnEntry] = None) -> int:
+    # pawns is the board's pawn structure, when a pawn table already has it
+    score = 0
+    kings: dict[Colour, tuple[int, int]] = {}
+    for position, square in board.squares.items():
+        piece = square.piece
+        if piece.type == PieceType.EMPTY:
+            continue
+        value = PIECE_SCORE[piece.type]
+        if piece.type != PieceType.KING:
+            value += CENTRE_BONUS[position]
+        else:
+            kings[piece.colour] = position
+        score += value if piece.colour == colour else -value
+    if pawns is None:
+        pawns = pawn_structure(board)
+    structure = pawns.score + king_shield(pawns, kings)
+    return score + (structure if colour == Colour.WHITE else -structure)
+
+
+def tablebase_score(result: TablebaseResult, ply: int) -> int:
+    if result.wdl == Wdl.WIN:
+        return MATE_SCORE - ply - result.dtm
+    if result.wdl == Wdl.LOSS:
+        return -MATE_SCORE + ply + result.dtm
+    return 0
+
+
+def order_moves(board: Board, moves: list[CoordinateMove]) -> list[CoordinateMove]:
+    squares = board.squares
+
+    def priority(move: CoordinateMove) -> int:
+        victim = PIECE_SCORE[squares[move.destination].piece.type]
+        attacker = PIECE_SCORE[squares[move.origin].piece.type]
+        return 10 * victim - attacker // 10 + PIECE_SCORE[move.promote_to]
+
+    return sorted(moves, key=priority, reverse=True)
+
+
+def see(board: Board, move: CoordinateMove) -> int:
+    # Static exchange evaluation: play out the cheapest recapture on the
+    # destination square in turn, then let either side stop when ahead
+    squares = board.squares
+    target = move.destination
+    piece = squares[move.origin].piece
+    captured = squares[target].piece.type
+    if captured == PieceType.EMPTY and piece.type == PieceType.PAWN:
+        captured = PieceType.PAWN
+
+    gains = [SEE_VALUE[captured]]
+    on_square = SEE_VALUE[piece.type]
+    empty = Piece.make_empty_piece()
+    removed = [(move.origin, piece)]
+    squares[move.origin].piece = empty
+    side = other_colour(piece.colour)
+    while True:
+        candidates = attackers(board, target, side)
+        if not candidates:
+            break
+        origin = min(
+            candidates, key=lambda position: SEE_VALUE[squares[position].piece.type]
+        )
+        attacker = squares[origin].piece
+        gains.append(on_square - gains[-1])
+        on_square = SEE_VALUE[attacker.type]
+        removed.append((origin, attacker))
+        squares[origin].piece = empty
+        side = other_colour(side)
+
+    for position, removed_piece in removed:
+        squares[position].piece = removed_piece
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
+def gives_check(board: Board, move: CoordinateMove, colour: Colour) -> bool:
+    record = make_move(board, move)
+    checking = in_check(board, other_colour(colour))
+    unmake_move(board, record)
+    return checking
+
+
+def has_pieces(board: Board, colour: Colour) -> bool:
+    # With only king and pawns, passing may well be the best move there is,
+    # so null-move pruning is unsafe
+    for square in board.squares.values():
+        piece = square.piece
+        if piece.colour == colour and piece.type not in (
+            PieceType.EMPTY,
+            PieceType.PAWN,
+            PieceType.KING,
+        ):
+            return True
+    return False
+
+
+def to_table(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the node rather than the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+@dataclass
+class TableEntry:
+    key: int
+    depth: int
+    score: int
+    bound: int
+    move: Optional[CoordinateMove]
+
+
+class HashTable(Protocol):
+    # What the search needs of a hash table, in process or shared
+    def probe(self, key: int) -> Optional[TableEntry]: ...
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        score: int,
+        bound: int,
+        move: Optional[CoordinateMove],
+    ) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class TranspositionTable:
+    def __init__(self, size: int = 1 << 16) -> None:
+        self.size = size
+        self.slots: list[Optional[TableEntry]] = [None] * size
+
+    def probe(self, key: int) -> Optional[TableEntry]:
+        entry = self.slots[key % self.size]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        score: int,
+        bound: int,
+        move: Optional[CoordinateMove],
+    ) -> None:
+        index = key % self.size
+        current = self.slots[index]
+        if current is None or current.key != key or depth >= current.depth:
+            self.slots[index] = TableEntry(key, depth, score, bound, move)
+
+    def clear(self) -> None:
+        self.slots = [None] * self.size
+
+
+class SearchAborted(Exception):
+    pass
+
+
+@dataclass
+class SearchResult:
+    move: Optional[CoordinateMove]
+    score: int
+    depth: int
+    nodes: int
+
+
+class Searcher:
+    def __init__(
+        self,
+        tablebase: Optional[Tablebase] = None,
+        hash_size: int = 1 << 16,
+        quiescence: bool = True,
+        see_pruning: bool = True,
+        quiescence_checks: bool = False,
+        null_move: bool = True,
+        late_move_reductions: bool = True,
+        pawn_hash_size: int = 1 << 14,
+    ) -> None:
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.see_pruned = 0
+        self.null_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.tablebase = tablebase
+        self.quiescence = quiescence
+        self.see_pruning = see_pruning
+        self.quiescence_checks = quiescence_checks
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.table: Optional[HashTable] = (
+            TranspositionTable(hash_size) if hash_size else None
+        )
+        self.pawn_table = PawnTable(pawn_hash_size) if pawn_hash_size else None
+        # The pawn-only key of the board being searched, kept up to date
+        # through every move made and unmade
+        self.pawn_key = 0
+        self.stop: Optional[Event] = None
+        self.deadline: Optional[float] = None
+        self.timer: Optional[MoveTimer] = None
+        # The best root move of the depth being searched, and its score
+        self.root_best: Optional[tuple[CoordinateMove, int]] = None
+
+    def search(
+        self,
+        board: Board,
+        colour: Colour,
+        depth: int,
+        stop: Optional[Event] = None,
+        deadline: Optional[float] = None,
+        info: Optional[Callable[[SearchResult], None]] = None,
+        timer: Optional[MoveTimer] = None,
+        first_depth: int = 1,
+    ) -> SearchResult:
+        # Setting stop, or reaching the time.monotonic() deadline, ends the
+        # search early with the result of the last completed depth, or the
+        # best move of the first depth so far if it did not complete. info is
+        # called with the result of every completed depth, and a timer sets
+        # the deadline, which may move while the search runs, and decides
+        # when to stop deepening
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.see_pruned = 0
+        self.null_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.stop = stop
+        self.pawn_key = pawn_key(board)
+        self.deadline = deadline
+        self.timer = timer
+        self.root_best = None
+        result = SearchResult(None, 0, 0, 0)
+        try:
+            for current_depth in range(first_depth, depth + 1):
+                move, score = self._root(board, colour, current_depth, result.move)
+                result = SearchResult(move, score, current_depth, self.nodes)
+                if info is not None:
+                    info(result)
+                if move is None or (timer is not None and timer.stop_after(result)):
+                    break
+        except SearchAborted:
+            # Cut off before any depth completed: play the best move the
+            # unfinished one got to, so there is always a move to play
+            if result.move is None and self.root_best is not None:
+                move, score = self.root_best
+                result = SearchResult(move, score, 0, self.nodes)
+        finally:
+            self.stop = None
+            self.deadline = None
+            self.timer = None
+        return result
+
+    def _stopped(self) -> bool:
+        deadline = self.deadline if self.timer is None else self.timer.deadline
+        return (self.stop is not None and self.stop.is_set()) or (
+            deadline is not None and time.monotonic() >= deadline
+        )
+
+    def _check_stop(self) -> None:
+        if not self.nodes % CHECK_INTERVAL and self._stopped():
+            raise SearchAborted
+
+    def _make(self, board: Board, move: CoordinateMove) -> MoveRecord:
+        record = make_move(board, move)
+        self.pawn_key ^= pawn_key_change(record)
+        return record
+
+    def _unmake(self, board: Board, record: MoveRecord) -> None:
+        unmake_move(board, record)
+        self.pawn_key ^= pawn_key_change(record)
+
+    def _evaluate(self, board: Board, colour: Colour) -> int:
+        if self.pawn_table is None:
+            return evaluate(board, colour)
+        return evaluate(board, colour, self.pawn_table.get(board, self.pawn_key))
+
+    def _root(
+        self,
+        board: Board,
+        colour: Colour,
+        depth: int,
+        previous_best: Optional[CoordinateMove],
+    ) -> tuple[Optional[CoordinateMove], int]:
+        moves = order_moves(board, legal_moves(board, colour))
+        if not moves:
+            return None, -MATE_SCORE if in_check(board, colour) else 0
+        if previous_best in moves:
+            moves.remove(previous_best)
+            moves.insert(0, previous_best)
+
+        best_move = moves[0]
+        alpha = -INFINITY
+        # Until a move has been searched, the first in order stands in
+        self.root_best = (best_move, 0)
+        for index, move in enumerate(moves):
+            # Checked between root moves too, as the first few may fit in
+            # fewer nodes than the check interval
+            if index and self._stopped():
+                raise SearchAborted
+            record = self._make(board, move)
+            try:
+                score = -self._negamax(
+                    board, other_colour(colour), depth - 1, -INFINITY, -alpha, 1
+                )
+            finally:
+                self._unmake(board, record)
+            if score > alpha:
+                alpha = score
+                best_move = move
+                self.root_best = (move, score)
+        return best_move, alpha
+
+    def _negamax(
+        self,
+        board: Board,
+        colour: Colour,
+        depth: int,
+        alpha: int,
+        beta: int,
+        ply: int,
+        allow_null: bool = True,
+    ) -> int:
+        self.nodes += 1
+        self._check_stop()
+        if self.tablebase is not None:
+            result = self.tablebase.probe(board, colour)
+            if result is not None:
+                return tablebase_score(result, ply)
+
+        if depth <= 0:
+            if self.quiescence:
+                return self._quiescence(board, colour, alpha, beta, ply, 0)
+            return self._evaluate(board, colour)
+
+        key = 0
+        table_move = None
+        if self.table is not None:
+            key = polyglot_key(board, colour)
+            entry = self.table.probe(key)
+            if entry is not None:
+                table_move = entry.move
+                if entry.depth >= depth:
+                    score = from_table(entry.score, ply)
+                    if (
+                        entry.bound == EXACT
+                        or (entry.bound == LOWER and score >= beta)
+                        or (entry.bound == UPPER and score <= alpha)
+                    ):
+                        return score
+
+        opponent = other_colour(colour)
+        checked = in_check(board, colour)
+        if (
+            self.null_move
+            and allow_null
+            and not checked
+            and depth >= NULL_MOVE_MIN_DEPTH
+            and abs(beta) < MATE_BOUND
+            and has_pieces(board, colour)
+            and self._evaluate(board, colour) >= beta
+        ):
+            # If passing still fails high, a real move surely would too
+            last_moved = make_null_move(board)
+            try:
+                score = -self._negamax(
+                    board,
+                    opponent,
+                    depth - 1 - NULL_MOVE_REDUCTION,
+                    -beta,
+                    -beta + 1,
+                    ply + 1,
+                    False,
+                )
+            finally:
+                unmake_null_move(last_moved)
+            if score >= beta:
+                self.null_cutoffs += 1
+                # A mate found after passing is not a proven mate
+                return beta if score >= MATE_BOUND else score
+
+        moves = legal_moves(board, colour)
+        if not moves:
+            return -MATE_SCORE + ply if checked else 0
+
+        moves = order_moves(board, moves)
+        if table_move in moves:
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for index, move in enumerate(moves):
+            reduce = (
+                self.late_move_reductions
+                and index >= LATE_MOVE_COUNT
+                and depth >= LATE_MOVE_MIN_DEPTH
+                and not checked
+                and move != table_move
+                and move.promote_to == PieceType.EMPTY
+                and not is_capture(board, move)
+            )
+            record = self._make(board, move)
+            try:
+                score = alpha + 1
+                if reduce and not in_check(board, opponent):
+                    self.reductions += 1
+                    reduction = 2 if index >= LATE_MOVE_DOUBLE else 1
+                    score = -self._negamax(
+                        board,
+                        opponent,
+                        depth - 1 - reduction,
+                        -alpha - 1,
+                        -alpha,
+                        ply + 1,
+                    )
+                    if score > alpha:
+                        self.re_searches += 1
+                if score > alpha:
+                    score = -self._negamax(
+                        board, opponent, depth - 1, -beta, -alpha, ply + 1
+                    )
+            finally:
+                self._unmake(board, record)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if self.table is not None:
+            if best_score >= beta:
+                bound = LOWER
+            elif best_score > original_alpha:
+                bound = EXACT
+            else:
+                bound = UPPER
+            self.table.store(key, depth, to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def _quiescence(
+        self,
+        board: Board,
+        colour: Colour,
+        alpha: int,
+        beta: int,
+        ply: int,
+        depth: int,
+    ) -> int:
+        self.nodes += 1
+        self.quiescence_nodes += 1
+        self._check_stop()
+        checked = in_check(board, colour)
+        if checked:
+            # No standing pat in check: every evasion is searched
+            moves = legal_moves(board, colour)
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = self._evaluate(board, colour)
+            if best_score >= beta:
+                return best_score
+            alpha = max(alpha, best_score)
+            info = check_info(board, colour)
+            moves = [
+                move
+                for move in pseudo_legal_moves(board, colour)
+                if (
+                    is_capture(board, move)
+                    or move.promote_to != PieceType.EMPTY
+                    or (
+                        self.quiescence_checks
+                        and depth == 0
+                        and gives_check(board, move, colour)
+                    )
+                )
+                and is_legal(board, move, colour, info)
+            ]
+
+        for move in order_moves(board, moves):
+            if (
+                self.see_pruning
+                and not checked
+                and is_capture(board, move)
+                and see(board, move) < 0
+            ):
+                self.see_pruned += 1
+                continue
+            record = self._make(board, move)
+            try:
+                score = -self._quiescence(
+                    board, other_colour(colour), -beta, -alpha, ply + 1, depth + 1
+                )
+            finally:
+                self._unmake(board, record)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
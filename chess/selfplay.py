@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Optional
+
+from chess import instrumentation
+from chess.adjudication import Adjudicator
+from chess.board import STARTING_FEN, Board
+from chess.book import BookSelection, OpeningBook
+from chess.clock import Clock
+from chess.engine import EnginePlayer
+from chess.movegen import make_move, san
+from chess.pgn import PgnGame, write_game
+from chess.pieces import PieceType
+from chess.tablebase import Tablebase
+from chess.utils import Colour
+
+
+@dataclass
+class MoveTime:
+    colour: Colour
+    elapsed: float
+    soft: Optional[float]
+    hard: Optional[float]
+
+
+def play_game(
+    white: EnginePlayer,
+    black: EnginePlayer,
+    board: Optional[Board] = None,
+    max_plies: int = 200,
+    tablebase: Optional[Tablebase] = None,
+    clock: Optional[Clock] = None,
+    times: Optional[list[MoveTime]] = None,
+) -> PgnGame:
+    board = board if board is not None else Board.from_fen(STARTING_FEN)
+    game = PgnGame(headers={"White": white.name, "Black": black.name})
+    player, opponent = white, black
+    adjudicator = Adjudicator(board, Colour.WHITE)
+    if clock is not None:
+        game.headers["TimeControl"] = f"{clock.base:g}+{clock.increment:g}"
+        clock.start(Colour.WHITE)
+
+    while len(game.moves) < max_plies:
+        outcome = tablebase.outcome(board, player.colour) if tablebase else None
+        if outcome is not None:
+            game.result = outcome.result
+            game.headers["Termination"] = "adjudication"
+            break
+        outcome = adjudicator.outcome(board)
+        if outcome is not None:
+            game.result = outcome.result
+            break
+        with instrumentation.phase("search"):
+            move = player.choose_move(board, clock)
+        if clock is not None:
+            elapsed = clock.press()
+            if times is not None:
+                timer = player.timer
+                times.append(
+                    MoveTime(
+                        player.colour,
+                        elapsed,
+                        None if timer is None else timer.soft,
+                        None if timer is None else timer.hard,
+                    )
+                )
+            if clock.flagged(player.colour):
+                game.result = "1-0" if opponent.colour == Colour.WHITE else "0-1"
+                game.headers["Termination"] = "time forfeit"
+                break
+        game.moves.append(san(board, move, player.colour))
+        with instrumentation.phase("complete move"):
+            record = make_move(board, move)
+        if record.captured.type != PieceType.EMPTY:
+            player.pieces_captured.append(record.captured)
+        adjudicator.update(board, move, record.piece.type, record.captured.type)
+        player, opponent = opponent, player
+
+    if clock is not None:
+        clock.stop()
+    game.headers["Result"] = game.result
+    return game
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.selfplay", description="Play engine against engine"
+    )
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--book", help="Polyglot book used by both engines")
+    parser.add_argument(
+        "--book-selection",
+        choices=[selection.value for selection in BookSelection],
+        default=BookSelection.WEIGHTED.value,
+    )
+    parser.add_argument("--tablebases", help="directory of endgame tablebases")
+    parser.add_argument(
+        "--time",
+        type=float,
+        help="seconds on each engine's clock per game, instead of a fixed depth",
+    )
+    parser.add_argument(
+        "--increment", type=float, default=0.0, help="seconds added after each move"
+    )
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--stats", help="write call counts and timings as JSON")
+    parser.add_argument("--profile", help="write cProfile stats for all games")
+    args = parser.parse_args()
+
+    book = OpeningBook(args.book) if args.book else None
+    tablebase = Tablebase(args.tablebases) if args.tablebases else None
+    rng = random.Random(args.seed)
+    if args.stats:
+        instrumentation.enable()
+    profiler = instrumentation.profile(args.profile) if args.profile else nullcontext()
+    times: list[MoveTime] = []
+    flags = 0
+    usage: list[float] = []
+    try:
+        with profiler:
+            for _ in range(args.games):
+                players = [
+                    EnginePlayer(
+                        f"Engine {colour}",
+                        0,
+                        colour,
+                        depth=args.depth,
+                        book=book,
+                        book_selection=BookSelection(args.book_selection),
+                        rng=rng,
+                        tablebase=tablebase,
+                    )
+                    for colour in (Colour.WHITE, Colour.BLACK)
+                ]
+                clock = Clock(args.time, args.increment) if args.time else None
+                game = play_game(
+                    *players,
+                    max_plies=args.max_plies,
+                    tablebase=tablebase,
+                    clock=clock,
+                    times=times,
+                )
+                write_game(sys.stdout, game)
+                if clock is not None:
+                    flags += game.headers.get("Termination") == "time forfeit"
+                    for colour in (Colour.WHITE, Colour.BLACK):
+                        allotted = clock.base + clock.increment * clock.moves[colour]
+                        usage.append(1 - clock.remaining[colour] / allotted)
+    finally:
+        if book is not None:
+            book.close()
+        if tablebase is not None:
+            tablebase.close()
+        if args.stats:
+            instrumentation.write_stats(args.stats)
+
+    if args.time:
+        report_times(times, usage, flags)
+        if flags:
+            sys.exit(1)
+
+
+def report_times(times: list[MoveTime], usage: list[float], flags: int) -> None:
+    searched = [time for time in times if time.soft is not None]
+    print(f"{flags} game(s) lost on time", file=sys.stderr)
+    if usage:
+        print(
+            f"clock used: mean {sum(usage) / len(usage):.0%}, "
+            f"min {min(usage):.0%}, max {max(usage):.0%} of the time allotted",
+            file=sys.stderr,
+        )
+    if searched:
+        soft = [time.elapsed / time.soft for time in searched if time.soft]
+        # Near the end of a clock the hard limit can be a fraction of a
+        # millisecond, where only the overshoot in time means anything
+        hard = [time.elapsed / time.hard for time in searched if time.hard]
+        over = max(time.elapsed - (time.hard or 0.0) for time in searched)
+        print(
+            f"{len(searched)} searched moves: mean {sum(soft) / len(soft):.2f}x the "
+            f"soft limit, at most {max(hard, default=0.0):.2f}x the hard limit "
+            f"and {max(over, 0.0) * 1e3:.1f} ms past it",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import queue
+import time
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+from chess.benchmark import SEARCH_POSITIONS
+from chess.board import Board
+from chess.epd import board_from_fen, board_to_fen
+from chess.journal import decode_move, encode_move
+from chess.movegen import CoordinateMove
+from chess.search import SearchResult, Searcher, TableEntry
+from chess.utils import Colour
+from chess.workers import attach_memory
+
+SLOT_WORDS = 2
+SCORE_OFFSET = 1 << 31
+NO_MOVE = 0
+
+
+class SharedTranspositionTable:
+    # Each slot is two 64 bit words, the entry packed into one and XORed with
+    # its key in the other. Processes read and write slots without locks, and
+    # a slot torn by two writers no longer XORs back to the key, so it reads
+    # as a miss instead of as another position's entry. It fills the same
+    # HashTable role for Searcher as the in-process TranspositionTable
+    def __init__(self, size: int = 1 << 16, name: Optional[str] = None) -> None:
+        self.size = size
+        self.owner = name is None
+        if name is None:
+            self.memory = SharedMemory(create=True, size=size * SLOT_WORDS * 8)
+        else:
+            self.memory = attach_memory(name)
+        self.words = self.memory.buf.cast("Q")
+        if self.owner:
+            self.clear()
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def probe(self, key: int) -> Optional[TableEntry]:
+        index = (key % self.size) * SLOT_WORDS
+        data = self.words[index + 1]
+        if not data or self.words[index] ^ data != key:
+            return None
+        code = data & 0xFFFF
+        return TableEntry(
+            key,
+            (data >> 24) & 0xFF,
+            (data >> 32) - SCORE_OFFSET,
+            (data >> 16) & 0xFF,
+            None if code == NO_MOVE else decode_move(code),
+        )
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        score: int,
+        bound: int,
+        move: Optional[CoordinateMove],
+    ) -> None:
+        index = (key % self.size) * SLOT_WORDS
+        current = self.words[index + 1]
+        if (
+            current
+            and self.words[index] ^ current == key
+            and depth < (current >> 24) & 0xFF
+        ):
+            return
+        data = (
+            (score + SCORE_OFFSET) << 32
+            | min(depth, 0xFF) << 24
+            | bound << 16
+            | (NO_MOVE if move is None else encode_move(move))
+        )
+        self.words[index] = key ^ data
+        self.words[index + 1] = data
+
+    def clear(self) -> None:
+        self.memory.buf[:] = bytes(self.memory.size)
+
+    def close(self) -> None:
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+@dataclass
+class SmpResult:
+    move: Optional[CoordinateMove]
+    score: int
+    depth: int
+    nodes: int
+    seconds: float
+    # How long it took until some worker had completed each depth
+    depth_times: dict[int, float]
+
+
+def _worker(
+    index: int,
+    table_name: str,
+    table_size: int,
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    stop: multiprocessing.synchronize.Event,
+    options: dict[str, bool],
+) -> None:
+    table = SharedTranspositionTable(table_size, table_name)
+    searcher = Searcher(hash_size=0, **options)
+    searcher.table = table
+    try:
+        while (task := tasks.get()) is not None:
+            search_id, fen, depth = task
+            board, colour = board_from_fen(fen)
+
+            def info(result: SearchResult) -> None:
+                move = NO_MOVE if result.move is None else encode_move(result.move)
+                results.put(
+                    (search_id, index, result.depth, move, result.score, result.nodes)
+                )
+
+            # Odd workers run a ply ahead of the even ones, so that the
+            # workers spread over two depths instead of racing down one line
+            offset = index % 2
+            searcher.search(
+                board, colour, depth + offset, stop, info=info, first_depth=1 + offset
+            )
+            results.put((search_id, index, None, NO_MOVE, 0, searcher.nodes))
+    finally:
+        table.close()
+
+
+class LazySmp:
+    # Worker processes that search the same root and share one hash table;
+    # only the hash table ties their searches together
+    def __init__(
+        self,
+        workers: int,
+        hash_size: int = 1 << 16,
+        options: Optional[dict[str, bool]] = None,
+    ) -> None:
+        # Created before the workers start, so that they share the resource
+        # tracker it registers with
+        self.table = SharedTranspositionTable(hash_size)
+        self.tasks: list[multiprocessing.Queue] = []
+        self.results: multiprocessing.Queue = multiprocessing.Queue()
+        self.stop = multiprocessing.Event()
+        self.processes: list[multiprocessing.Process] = []
+        self.search_id = 0
+        for index in range(workers):
+            tasks: multiprocessing.Queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(
+                    index,
+                    self.table.name,
+                    hash_size,
+                    tasks,
+                    self.results,
+                    self.stop,
+                    options or {},
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.tasks.append(tasks)
+            self.processes.append(process)
+
+    def search(
+        self,
+        board: Board,
+        colour: Colour,
+        depth: int,
+        deadline: Optional[float] = None,
+    ) -> SmpResult:
+        # Ends as soon as any worker completes depth, or at the
+        # time.monotonic() deadline, with the deepest result any worker found
+        self.search_id += 1
+        self.stop.clear()
+        fen = board_to_fen(board, colour)
+        start = time.monotonic()
+        for tasks in self.tasks:
+            tasks.put((self.search_id, fen, depth))
+
+        best: Optional[tuple[int, int, int]] = None
+        depth_times: dict[int, float] = {}
+        nodes = 0
+        running = len(self.processes)
+        while running:
+            timeout = None
+            if deadline is not None and not self.stop.is_set():
+                timeout = max(deadline - time.monotonic(), 0.0)
+            try:
+                search_id, _, reached, move, score, worker_nodes = self.results.get(
+                    timeout=timeout
+                )
+            except queue.Empty:
+                self.stop.set()
+                continue
+            if search_id != self.search_id:
+                continue
+            if reached is None:
+                running -= 1
+                nodes += worker_nodes
+                continue
+            if reached not in depth_times:
+                depth_times[reached] = time.monotonic() - start
+            if best is None or reached > best[0]:
+                best = (reached, move, score)
+            if reached >= depth:
+                self.stop.set()
+
+        seconds = time.monotonic() - start
+        if best is None:
+            return SmpResult(None, 0, 0, nodes, seconds, depth_times)
+        reached, move, score = best
+        return SmpResult(
+            None if move == NO_MOVE else decode_move(move),
+            score,
+            reached,
+            nodes,
+            seconds,
+            depth_times,
+        )
+
+    def close(self) -> None:
+        self.stop.set()
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.table.close()
+
+    def __enter__(self) -> LazySmp:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.smp",
+        description="Time Lazy SMP searches to a fixed depth with more workers",
+    )
+    parser.add_argument("fens", nargs="*", help="standard FEN positions to search")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument(
+        "--workers",
+        default="1,2,4,8,16",
+        help="comma separated worker counts to time",
+    )
+    parser.add_argument("--hash-size", type=int, default=1 << 18)
+    args = parser.parse_args()
+
+    fens = args.fens or SEARCH_POSITIONS
+    baseline = 0.0
+    print(f"{'workers':>7} {'seconds':>8} {'nodes':>10} {'speedup':>7}")
+    for workers in (int(count) for count in args.workers.split(",")):
+        seconds = 0.0
+        nodes = 0
+        with LazySmp(workers, args.hash_size) as smp:
+            for fen in fens:
+                smp.table.clear()
+                board, colour = board_from_fen(fen)
+                result = smp.search(board, colour, args.depth)
+                seconds += result.depth_times.get(args.depth, result.seconds)
+                nodes += result.nodes
+        baseline = baseline or seconds
+        print(f"{workers:7} {seconds:8.2f} {nodes:10} {baseline / seconds:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
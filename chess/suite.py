@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator, Optional
+
+from chess.epd import parse_epd
+from chess.movegen import san
+from chess.search import MAX_DEPTH, SearchResult, Searcher
+from chess.workers import current_worker, start_worker
+
+# Fractions of the time limit at which the number solved so far is reported
+TIME_STEPS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+@dataclass
+class SuitePosition:
+    label: str
+    epd: str
+
+
+@dataclass
+class SolveResult:
+    label: str
+    fen: str
+    best_moves: list[str]
+    avoid_moves: list[str]
+    move: Optional[str]
+    solved: bool
+    depth: int
+    nodes: int
+    # Of the nodes, those in quiescence search, and the captures it skipped
+    # as losing by static exchange evaluation
+    quiescence_nodes: int
+    see_pruned: int
+    seconds: float
+    # When the engine settled on a solution for good, or None if it never did
+    solution_seconds: Optional[float]
+    solution_nodes: Optional[int]
+    solution_depth: Optional[int]
+
+
+def read_suite(path: str) -> Iterator[SuitePosition]:
+    with open(path) as stream:
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield SuitePosition(parse_epd(line).id or f"{path}:{number}", line)
+
+
+def is_solution(move: str, best_moves: list[str], avoid_moves: list[str]) -> bool:
+    move = move.rstrip("+#")
+    if best_moves and move not in best_moves:
+        return False
+    return move not in avoid_moves
+
+
+def solve(
+    searcher: Searcher, position: SuitePosition, time_limit: float, max_depth: int
+) -> SolveResult:
+    record = parse_epd(position.epd)
+    board, colour = record.board, record.colour
+    fen = " ".join(position.epd.split()[:4])
+    best_moves = [move.rstrip("+#") for move in record.operations.get("bm", [])]
+    avoid_moves = [move.rstrip("+#") for move in record.operations.get("am", [])]
+    iterations: list[tuple[float, SearchResult, bool]] = []
+
+    def info(result: SearchResult) -> None:
+        solved = result.move is not None and is_solution(
+            san(board, result.move, colour), best_moves, avoid_moves
+        )
+        iterations.append((time.monotonic() - start, result, solved))
+
+    if searcher.table is not None:
+        searcher.table.clear()
+    start = time.monotonic()
+    result = searcher.search(
+        board, colour, max_depth, deadline=start + time_limit, info=info
+    )
+    seconds = time.monotonic() - start
+
+    solution: Optional[tuple[float, SearchResult, bool]] = None
+    for iteration in reversed(iterations):
+        if not iteration[2]:
+            break
+        solution = iteration
+    return SolveResult(
+        position.label,
+        fen,
+        best_moves,
+        avoid_moves,
+        None if result.move is None else san(board, result.move, colour),
+        solution is not None,
+        result.depth,
+        searcher.nodes,
+        searcher.quiescence_nodes,
+        searcher.see_pruned,
+        seconds,
+        None if solution is None else solution[0],
+        None if solution is None else solution[1].nodes,
+        None if solution is None else solution[1].depth,
+    )
+
+
+def solve_position(position: SuitePosition) -> SolveResult:
+    worker = current_worker()
+    return solve(
+        worker.searcher,
+        position,
+        worker.settings["time_limit"],
+        worker.settings["max_depth"],
+    )
+
+
+def run_suite(
+    positions: list[SuitePosition],
+    time_limit: float,
+    workers: int = 1,
+    max_depth: int = MAX_DEPTH,
+    hash_size: int = 1 << 16,
+    options: Optional[dict[str, bool]] = None,
+) -> list[SolveResult]:
+    initargs = (
+        {"hash_size": hash_size, **(options or {})},
+        {"time_limit": time_limit, "max_depth": max_depth},
+    )
+    if workers <= 1:
+        start_worker(*initargs)
+        return [solve_position(position) for position in positions]
+    with multiprocessing.Pool(
+        workers,
+        initializer=start_worker,
+        initargs=initargs,
+    ) as pool:
+        return pool.map(solve_position, positions, chunksize=1)
+
+
+def _distribution(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "mean": statistics.fmean(ordered),
+        "median": statistics.median(ordered),
+        "p90": ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))],
+        "max": ordered[-1],
+    }
+
+
+def summarise(results: list[SolveResult], time_limit: float) -> dict[str, Any]:
+    solved = [result for result in results if result.solved]
+    times = [result.solution_seconds or 0.0 for result in solved]
+    return {
+        "positions": len(results),
+        "solved": len(solved),
+        "solved_within": {
+            f"{fraction * time_limit:g}": sum(
+                seconds <= fraction * time_limit for seconds in times
+            )
+            for fraction in TIME_STEPS
+        },
+        "time_to_solution": _distribution(times),
+        "nodes_to_solution": _distribution(
+            [float(result.solution_nodes or 0) for result in solved]
+        ),
+        "nodes": sum(result.nodes for result in results),
+        "seconds": sum(result.seconds for result in results),
+    }
+
+
+def report(summary: dict[str, Any]) -> None:
+    print(f"solved {summary['solved']}/{summary['positions']}")
+    for limit, count in summary["solved_within"].items():
+        print(f"  within {float(limit):7.3f}s {count:4}")
+    for name in ("time_to_solution", "nodes_to_solution"):
+        values = summary[name]
+        if values:
+            print(
+                f"{name.replace('_', ' '):17} "
+                + " ".join(f"{key} {value:.3g}" for key, value in values.items())
+            )
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> None:
+    before = {position["label"]: position for position in baseline["positions"]}
+    for position in results["positions"]:
+        old = before.get(position["label"])
+        if old is None or old["solved"] == position["solved"]:
+            continue
+        change = "now solved" if position["solved"] else "no longer solved"
+        print(f"{position['label']:20} {change} ({old['move']} -> {position['move']})")
+    for key in ("solved", "nodes"):
+        print(
+            f"{key:8} {baseline['summary'][key]:>10} -> {results['summary'][key]:>10}"
+        )
+    for name in ("time_to_solution", "nodes_to_solution"):
+        old_median = baseline["summary"][name].get("median")
+        new_median = results["summary"][name].get("median")
+        if old_median is not None and new_median is not None:
+            print(
+                f"median {name.replace('_', ' ')} {old_median:.3g} -> {new_median:.3g}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.suite",
+        description="Solve an EPD test suite with bm and am operations",
+    )
+    parser.add_argument("suite", help="EPD file")
+    parser.add_argument(
+        "-t", "--time", type=float, default=1.0, help="seconds per position"
+    )
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    parser.add_argument(
+        "--hash-size", type=int, default=1 << 16, help="hash entries per worker"
+    )
+    parser.add_argument(
+        "--no-null-move", action="store_true", help="turn off null-move pruning"
+    )
+    parser.add_argument(
+        "--no-lmr", action="store_true", help="turn off late-move reductions"
+    )
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="compare with a saved result file")
+    args = parser.parse_args()
+
+    positions = list(read_suite(args.suite))
+    options = {
+        "null_move": not args.no_null_move,
+        "late_move_reductions": not args.no_lmr,
+    }
+    results = run_suite(
+        positions,
+        args.time,
+        args.workers,
+        args.max_depth,
+        args.hash_size,
+        options,
+    )
+    summary = summarise(results, args.time)
+    for result in results:
+        print(
+            f"{result.label:20} {'ok ' if result.solved else '-- '}"
+            f"{result.move or '-':8} depth {result.depth:2} {result.nodes:9} nodes"
+        )
+    report(summary)
+
+    output = {
+        "suite": args.suite,
+        "time_limit": args.time,
+        "max_depth": args.max_depth,
+        "hash_size": args.hash_size,
+        "options": options,
+        "workers": args.workers,
+        "python": platform.python_version(),
+        "summary": summary,
+        "positions": [asdict(result) for result in results],
+    }
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(output, stream, indent=2)
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+        print()
+        compare(output, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import time
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Optional
+
+from chess.adjudication import Outcome, Termination
+from chess.movegen import PIECE_LETTER
+from chess.pieces import PieceType
+from chess.utils import Colour, other_colour
+
+if TYPE_CHECKING:
+    from chess.board import Board
+
+Squares = tuple[int, ...]
+
+MATERIALS: dict[str, tuple[PieceType, ...]] = {
+    "KQK": (PieceType.QUEEN,),
+    "KRK": (PieceType.ROOK,),
+    "KPK": (PieceType.PAWN,),
+    "KBNK": (PieceType.BISHOP, PieceType.KNIGHT),
+}
+PIECE_ORDER = (
+    PieceType.QUEEN,
+    PieceType.ROOK,
+    PieceType.BISHOP,
+    PieceType.KNIGHT,
+    PieceType.PAWN,
+)
+DEPENDENCIES: dict[str, tuple[str, ...]] = {"KPK": ("KQK", "KRK")}
+
+STRONG, WEAK = 0, 1
+
+UNKNOWN, ILLEGAL, WIN, LOSS, DRAW = range(5)
+WDL_CODE = {UNKNOWN: 0, DRAW: 0, WIN: 1, LOSS: 2, ILLEGAL: 3}
+
+
+class Wdl(IntEnum):
+    LOSS = -1
+    DRAW = 0
+    WIN = 1
+
+
+CODE_WDL = {0: Wdl.DRAW, 1: Wdl.WIN, 2: Wdl.LOSS}
+
+
+@dataclass(frozen=True)
+class TablebaseResult:
+    wdl: Wdl
+    dtm: int
+
+
+def _on_board(file: int, rank: int) -> bool:
+    return 0 <= file < 8 and 0 <= rank < 8
+
+
+def _steps(offsets: tuple[tuple[int, int], ...]) -> list[tuple[int, ...]]:
+    return [
+        tuple(
+            (rank + dr) * 8 + file + df
+            for df, dr in offsets
+            if _on_board(file + df, rank + dr)
+        )
+        for rank in range(8)
+        for file in range(8)
+    ]
+
+
+def _rays(offsets: tuple[tuple[int, int], ...]) -> list[tuple[tuple[int, ...], ...]]:
+    rays = []
+    for square in range(64):
+        file, rank = square & 7, square >> 3
+        square_rays = []
+        for df, dr in offsets:
+            ray = []
+            target_file, target_rank = file + df, rank + dr
+            while _on_board(target_file, target_rank):
+                ray.append(target_rank * 8 + target_file)
+                target_file += df
+                target_rank += dr
+            if ray:
+                square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return rays
+
+
+_ORTHOGONAL = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_DIAGONAL = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+_KNIGHT = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+
+KING_STEPS = _steps(_ORTHOGONAL + _DIAGONAL)
+KING_ZONE = [frozenset(steps) for steps in KING_STEPS]
+KNIGHT_STEPS = _steps(_KNIGHT)
+KNIGHT_ZONE = [frozenset(steps) for steps in KNIGHT_STEPS]
+PAWN_ZONE = [frozenset(steps) for steps in _steps(((-1, 1), (1, 1)))]
+SLIDER_RAYS: dict[PieceType, list[tuple[tuple[int, ...], ...]]] = {
+    PieceType.ROOK: _rays(_ORTHOGONAL),
+    PieceType.BISHOP: _rays(_DIAGONAL),
+    PieceType.QUEEN: _rays(_ORTHOGONAL + _DIAGONAL),
+}
+
+
+def _lines() -> dict[PieceType, list[list[Optional[tuple[int, ...]]]]]:
+    lines: dict[PieceType, list[list[Optional[tuple[int, ...]]]]] = {}
+    for piece_type, rays in SLIDER_RAYS.items():
+        table: list[list[Optional[tuple[int, ...]]]] = [[None] * 64 for _ in range(64)]
+        for origin in range(64):
+            for ray in rays[origin]:
+                for distance, target in enumerate(ray):
+                    table[origin][target] = ray[:distance]
+        lines[piece_type] = table
+    return lines
+
+
+# BETWEEN[piece][a][b] holds the squares a slider on a must cross to reach b
+BETWEEN = _lines()
+
+TRANSFORMS: list[tuple[int, ...]] = [
+    tuple(
+        (
+            (7 - rank if flip_rank else rank) * 8 + (7 - file if flip_file else file)
+            if not transpose
+            else (7 - file if flip_rank else file) * 8
+            + (7 - rank if flip_file else rank)
+        )
+        for rank in range(8)
+        for file in range(8)
+    )
+    for transpose in (False, True)
+    for flip_rank in (False, True)
+    for flip_file in (False, True)
+]
+TRIANGLE = (0, 1, 2, 3, 9, 10, 11, 18, 19, 27)
+TRIANGLE_INDEX = {square: index for index, square in enumerate(TRIANGLE)}
+KING_TRANSFORMS: list[tuple[tuple[int, ...], ...]] = [
+    tuple(transform for transform in TRANSFORMS if transform[square] in TRIANGLE_INDEX)
+    for square in range(64)
+]
+
+
+class Material:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.pieces = MATERIALS[name]
+        self.has_pawn = PieceType.PAWN in self.pieces
+        self.placements = 64 ** len(self.pieces)
+        if self.has_pawn:
+            self.size = 2 * 24 * 64 * 64
+        else:
+            self.size = 2 * 10 * 64 * self.placements
+
+    def _raw_index(self, stm: int, squares: Squares) -> int:
+        if self.has_pawn:
+            pawn = squares[2]
+            lead = stm * 24 + ((pawn >> 3) - 1) * 4 + (pawn & 7)
+            return (lead * 64 + squares[0]) * 64 + squares[1]
+        index = stm * 10 + TRIANGLE_INDEX[squares[0]]
+        for square in squares[1:]:
+            index = index * 64 + square
+        return index
+
+    def index(self, stm: int, squares: Squares) -> int:
+        if self.has_pawn:
+            if squares[2] & 7 > 3:
+                squares = tuple(square ^ 7 for square in squares)
+            return self._raw_index(stm, squares)
+        return min(
+            self._raw_index(stm, tuple(transform[square] for square in squares))
+            for transform in KING_TRANSFORMS[squares[0]]
+        )
+
+    def decode(self, index: int) -> tuple[int, Squares]:
+        if self.has_pawn:
+            lead, rest = divmod(index, 64 * 64)
+            stm, pawn_index = divmod(lead, 24)
+            pawn = ((pawn_index >> 2) + 1) * 8 + (pawn_index & 3)
+            return stm, (rest >> 6, rest & 63, pawn)
+        others: list[int] = []
+        for _ in range(len(self.pieces) + 1):
+            index, square = divmod(index, 64)
+            others.append(square)
+        stm, king = divmod(index, 10)
+        return stm, (TRIANGLE[king], *reversed(others))
+
+
+def _attacked(
+    pieces: tuple[PieceType, ...],
+    squares: Squares,
+    target: int,
+    blockers: frozenset[int],
+) -> bool:
+    if target in KING_ZONE[squares[0]]:
+        return True
+    for piece_type, square in zip(pieces, squares[2:]):
+        if square == target:
+            continue
+        if piece_type == PieceType.KNIGHT:
+            if target in KNIGHT_ZONE[square]:
+                return True
+        elif piece_type == PieceType.PAWN:
+            if target in PAWN_ZONE[square]:
+                return True
+        else:
+            between = BETWEEN[piece_type][square][target]
+            if between is not None and not any(s in blockers for s in between):
+                return True
+    return False
+
+
+def _weak_king_moves(
+    pieces: tuple[PieceType, ...], squares: Squares
+) -> tuple[list[int], bool]:
+    strong = squares[2:]
+    blockers = frozenset((squares[0], *strong))
+    moves: list[int] = []
+    for target in KING_STEPS[squares[1]]:
+        if target == squares[0] or target in KING_ZONE[squares[0]]:
+            continue
+        if target in strong:
+            if not _attacked(pieces, squares, target, blockers - {target}):
+                return moves, True
+            continue
+        if not _attacked(pieces, squares, target, blockers):
+            moves.append(target)
+    return moves, False
+
+
+def _strong_unmoves(pieces: tuple[PieceType, ...], squares: Squares) -> list[Squares]:
+    occupied = frozenset(squares)
+    predecessors: list[Squares] = []
+    for target in KING_STEPS[squares[0]]:
+        if target not in occupied:
+            predecessors.append((target, *squares[1:]))
+    for slot, piece_type in enumerate(pieces, start=2):
+        square = squares[slot]
+        if piece_type == PieceType.KNIGHT:
+            targets: list[int] = [t for t in KNIGHT_STEPS[square] if t not in occupied]
+        elif piece_type == PieceType.PAWN:
+            targets = []
+            if square >> 3 >= 2 and square - 8 not in occupied:
+                targets.append(square - 8)
+                if square >> 3 == 3 and square - 16 not in occupied:
+                    targets.append(square - 16)
+        else:
+            targets = []
+            for ray in SLIDER_RAYS[piece_type][square]:
+                for target in ray:
+                    if target in occupied:
+                        break
+                    targets.append(target)
+        for target in targets:
+            predecessors.append(squares[:slot] + (target,) + squares[slot + 1 :])
+    return predecessors
+
+
+def _is_illegal(material: Material, stm: int, squares: Squares) -> bool:
+    if len(set(squares)) != len(squares) or squares[1] in KING_ZONE[squares[0]]:
+        return True
+    if stm == STRONG:
+        return _attacked(material.pieces, squares, squares[1], frozenset(squares))
+    return False
+
+
+def generate(
+    name: str, dependencies: Optional[dict[str, bytearray]] = None
+) -> tuple[bytearray, bytearray]:
+    material = Material(name)
+    pieces = material.pieces
+    state = bytearray(material.size)
+    dtm = bytearray(material.size)
+    frontier: list[int] = []
+    seeds: dict[int, list[int]] = {}
+
+    for index in range(material.size):
+        stm, squares = material.decode(index)
+        if _is_illegal(material, stm, squares) or material.index(stm, squares) != index:
+            state[index] = ILLEGAL
+            continue
+        if stm == WEAK:
+            moves, escape = _weak_king_moves(pieces, squares)
+            if escape:
+                state[index] = DRAW
+            elif not moves:
+                if _attacked(pieces, squares, squares[1], frozenset(squares)):
+                    state[index] = LOSS
+                    frontier.append(index)
+                else:
+                    state[index] = DRAW
+        elif material.has_pawn and squares[2] >> 3 == 6:
+            promotion = squares[2] + 8
+            if promotion in squares[:2] or dependencies is None:
+                continue
+            for target_name, target_dtm in dependencies.items():
+                target = Material(target_name)
+                target_index = target.index(WEAK, (squares[0], squares[1], promotion))
+                value = target_dtm[target_index]
+                # Odd distances are wins for the side to move, so even ones lose
+                if value and (value - 1) % 2 == 0:
+                    seeds.setdefault(value, []).append(index)
+
+    level = 0
+    while frontier or seeds:
+        next_frontier: list[int] = []
+        for index in seeds.pop(level, []):
+            if state[index] == UNKNOWN:
+                state[index] = WIN
+                dtm[index] = level
+                frontier.append(index)
+
+        for index in frontier:
+            stm, squares = material.decode(index)
+            if stm == WEAK:
+                for predecessor in _strong_unmoves(pieces, squares):
+                    previous = material.index(STRONG, predecessor)
+                    if state[previous] == UNKNOWN:
+                        state[previous] = WIN
+                        dtm[previous] = level + 1
+                        next_frontier.append(previous)
+                continue
+
+            for target in KING_STEPS[squares[1]]:
+                if target in squares:
+                    continue
+                previous = material.index(WEAK, (squares[0], target, *squares[2:]))
+                if state[previous] != UNKNOWN:
+                    continue
+                _, previous_squares = material.decode(previous)
+                moves, _ = _weak_king_moves(pieces, previous_squares)
+                if all(
+                    state[
+                        material.index(
+                            STRONG, (previous_squares[0], move, *previous_squares[2:])
+                        )
+                    ]
+                    == WIN
+                    for move in moves
+                ):
+                    state[previous] = LOSS
+                    dtm[previous] = level + 1
+                    next_frontier.append(previous)
+
+        frontier = next_frontier
+        level += 1
+
+    return state, dtm
+
+
+def _dtm_bytes(state: bytearray, dtm: bytearray) -> bytearray:
+    # Store distance + 1 so that zero can mean draw or illegal
+    return bytearray(
+        distance + 1 if value in (WIN, LOSS) else 0
+        for value, distance in zip(state, dtm)
+    )
+
+
+def write_tables(
+    directory: str | os.PathLike[str], name: str, state: bytearray, dtm: bytearray
+) -> None:
+    os.makedirs(directory, exist_ok=True)
+    packed = bytearray((len(state) + 3) // 4)
+    for index, value in enumerate(state):
+        packed[index >> 2] |= WDL_CODE[value] << ((index & 3) * 2)
+    with open(os.path.join(directory, f"{name}.wdl"), "wb") as stream:
+        stream.write(packed)
+    with open(os.path.join(directory, f"{name}.dtm"), "wb") as stream:
+        stream.write(dtm)
+
+
+def generate_tables(
+    directory: str | os.PathLike[str], names: list[str], verbose: bool = False
+) -> None:
+    done: dict[str, bytearray] = {}
+
+    def build(name: str) -> None:
+        if name in done:
+            return
+        for dependency in DEPENDENCIES.get(name, ()):
+            build(dependency)
+        start = time.perf_counter()
+        dependencies = {
+            dependency: done[dependency] for dependency in DEPENDENCIES.get(name, ())
+        }
+        state, dtm = generate(name, dependencies or None)
+        done[name] = _dtm_bytes(state, dtm)
+        write_tables(directory, name, state, done[name])
+        if verbose:
+            wins = state.count(WIN)
+            print(
+                f"{name}: {len(state)} positions, {wins} wins, longest mate "
+                f"{max(done[name]) - 1} plies, {time.perf_counter() - start:.1f}s"
+            )
+
+    for name in names:
+        build(name)
+
+
+def material_key(board: Board) -> Optional[tuple[str, Colour, Squares]]:
+    kings: dict[Colour, int] = {}
+    extras: dict[Colour, list[tuple[PieceType, int]]] = {
+        Colour.WHITE: [],
+        Colour.BLACK: [],
+    }
+    for (file, rank), square in board.squares.items():
+        piece = square.piece
+        if piece.type == PieceType.EMPTY:
+            continue
+        if piece.type == PieceType.KING:
+            kings[piece.colour] = rank * 8 + file
+        else:
+            extras[piece.colour].append((piece.type, rank * 8 + file))
+
+    if extras[Colour.WHITE] and extras[Colour.BLACK]:
+        return None
+    strong = Colour.WHITE if extras[Colour.WHITE] else Colour.BLACK
+    weak = Colour.BLACK if strong == Colour.WHITE else Colour.WHITE
+    pieces = sorted(extras[strong], key=lambda extra: PIECE_ORDER.index(extra[0]))
+    name = "K" + "".join(PIECE_LETTER.get(extra[0], "P") for extra in pieces) + "K"
+    if name not in MATERIALS or len(kings) != 2:
+        return None
+
+    squares = (kings[strong], kings[weak], *(square for _, square in pieces))
+    if strong == Colour.BLACK:
+        squares = tuple(square ^ 56 for square in squares)
+    return name, strong, squares
+
+
+class Tablebase:
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self.directory = directory
+        self._files: list = []
+        self._tables: dict[str, tuple[Material, mmap.mmap, mmap.mmap]] = {}
+        for name in MATERIALS:
+            wdl_path = os.path.join(directory, f"{name}.wdl")
+            dtm_path = os.path.join(directory, f"{name}.dtm")
+            if not (os.path.exists(wdl_path) and os.path.exists(dtm_path)):
+                continue
+            maps = []
+            for path in (wdl_path, dtm_path):
+                stream = open(path, "rb")
+                self._files.append(stream)
+                maps.append(mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ))
+            self._tables[name] = (Material(name), maps[0], maps[1])
+
+    @property
+    def materials(self) -> list[str]:
+        return list(self._tables)
+
+    def __enter__(self) -> Tablebase:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for _, wdl, dtm in self._tables.values():
+            wdl.close()
+            dtm.close()
+        for stream in self._files:
+            stream.close()
+        self._tables.clear()
+        self._files.clear()
+
+    def probe(self, board: Board, colour: Colour) -> Optional[TablebaseResult]:
+        key = material_key(board)
+        if key is None or key[0] not in self._tables:
+            return None
+        name, strong, squares = key
+        material, wdl, dtm = self._tables[name]
+        index = material.index(STRONG if colour == strong else WEAK, squares)
+        code = (wdl[index >> 2] >> ((index & 3) * 2)) & 3
+        if code == 3:
+            return None
+        return TablebaseResult(CODE_WDL[code], max(dtm[index] - 1, 0))
+
+    def outcome(self, board: Board, colour: Colour) -> Optional[Outcome]:
+        # How the game ends with best play from here, with colour to move
+        result = self.probe(board, colour)
+        if result is None:
+            return None
+        if result.wdl == Wdl.DRAW:
+            return Outcome(Termination.TABLEBASE)
+        winner = colour if result.wdl == Wdl.WIN else other_colour(colour)
+        return Outcome(Termination.TABLEBASE, winner)
+
+
+def main() -> None:
+    from chess.board import Board
+
+    parser = argparse.ArgumentParser(
+        prog="python -m chess.tablebase", description="Endgame tablebases"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="generate tables")
+    build.add_argument("materials", nargs="*", default=list(MATERIALS))
+    build.add_argument("-d", "--directory", default="tablebases")
+    probe = commands.add_parser("probe", help="probe a position")
+    probe.add_argument("fen", help="piece placement in this game's FEN layout")
+    probe.add_argument("--colour", default="white", choices=["white", "black"])
+    probe.add_argument("-d", "--directory", default="tablebases")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_tables(args.directory, args.materials, verbose=True)
+        return
+
+    colour = Colour.WHITE if args.colour == "white" else Colour.BLACK
+    with Tablebase(args.directory) as tablebase:
+        result = tablebase.probe(Board.from_fen(args.fen), colour)
+    if result is None:
+        print("Position is not covered by the tablebases")
+    else:
+        loser = other_colour(colour) if result.wdl == Wdl.WIN else colour
+        outcome = (
+            "draw" if result.wdl == Wdl.DRAW else f"{loser} is mated in {result.dtm}"
+        )
+        print(f"{result.wdl.name} for {colour}: {outcome} plies")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
-from typing import Literal
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Literal
 
 from chess.board import Board
 from chess.exceptions import NotationError, OutOfBoundsError
-from chess.move import Move, MoveCategory
 from chess.pieces import FEN_MAP, PieceType
 from chess.players import Player
-from chess.utils import Colour, position_map
+from chess.utils import Colour, MoveCategory, position_map
+
+if TYPE_CHECKING:
+    from chess.move import Move
 
 
 class CLI:
@@ -20,6 +24,9 @@ class CLI:
 
     @staticmethod
     def parse_move(move: str, board: Board, player: Player) -> Move:
+        # Imported here so that pydantic only loads once a move is typed in
+        from chess.move import Move
+
         if len(move) > 7:
             raise NotationError(message="That is an invalid move!")
 
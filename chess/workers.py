@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Optional
+
+from chess.search import Searcher
+from chess.tablebase import Tablebase
+
+
+@dataclass
+class Worker:
+    searcher: Searcher
+    # Whatever else the pool's tasks all share, such as the search depth
+    settings: dict[str, Any]
+
+
+# Each pool worker builds its own searcher, and with it its own hash table
+_worker: Optional[Worker] = None
+
+
+def start_worker(
+    options: dict[str, Any],
+    settings: dict[str, Any],
+    tablebases: Optional[str] = None,
+) -> None:
+    # Pool initializer: options are Searcher keyword arguments
+    global _worker
+    tablebase = Tablebase(tablebases) if tablebases else None
+    _worker = Worker(Searcher(tablebase, **options), settings)
+
+
+def current_worker() -> Worker:
+    assert _worker is not None
+    return _worker
+
+
+def attach_memory(name: str, shared_tracker: bool = True) -> SharedMemory:
+    # Only the process that created a block may unlink it. Its workers share
+    # its resource tracker, which it starts before them, and registering the
+    # block there again has no effect. A process with a tracker of its own
+    # passes shared_tracker=False, and the registration is undone so that the
+    # block outlives it
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)
+    memory = SharedMemory(name)
+    if not shared_tracker:
+        resource_tracker.unregister(memory._name, "shared_memory")  # type: ignore[attr-defined]
+    return memory
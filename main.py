@@ -1,17 +1,106 @@
-from chess.board import Board
+import argparse
+
+from chess.board import STARTING_FEN, Board
+from chess import instrumentation
+from chess.book import OpeningBook
+from chess.clock import Clock
+from chess.engine import EnginePlayer
 from chess.game import ChessGame
+from chess.journal import GameJournal
+from chess.tablebase import Tablebase
 from chess.ui import CLI
 from chess.utils import Colour
 
 
 def main() -> None:
-    fen_str = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+    parser = argparse.ArgumentParser(description="A 2-player command-line chess game")
+    parser.add_argument(
+        "--engine",
+        choices=[Colour.WHITE.value.lower(), Colour.BLACK.value.lower()],
+        help="let the computer play this colour",
+    )
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--book", help="Polyglot opening book for the computer")
+    parser.add_argument(
+        "--ponder",
+        action="store_true",
+        help="let the computer think on the expected reply during your turn",
+    )
+    parser.add_argument(
+        "--tablebases", help="directory of endgame tablebases used to end games"
+    )
+    parser.add_argument(
+        "--time", type=float, help="minutes on each player's clock (no clock if unset)"
+    )
+    parser.add_argument(
+        "--increment", type=float, default=0.0, help="seconds added after each move"
+    )
+    parser.add_argument(
+        "--stats", help="write call counts and timings for the game to this JSON file"
+    )
+    parser.add_argument("--profile", help="write cProfile stats for the game here")
+    parser.add_argument(
+        "--journal", help="record moves to this file, resuming the game if it exists"
+    )
+    parser.add_argument(
+        "--fsync", action="store_true", help="fsync the journal after every move"
+    )
+    args = parser.parse_args()
+
+    tablebase = Tablebase(args.tablebases) if args.tablebases else None
     cli = CLI()
-    white_player = cli.make_player(Colour.WHITE)
-    black_player = cli.make_player(Colour.BLACK)
-    board = Board.from_fen(fen_str)
-    chess = ChessGame(white_player, black_player, board, cli)
-    chess.play()
+    players = {}
+    for colour in (Colour.WHITE, Colour.BLACK):
+        if args.engine == colour.value.lower():
+            book = OpeningBook(args.book) if args.book else None
+            players[colour] = EnginePlayer(
+                "Computer",
+                0,
+                colour,
+                depth=args.depth,
+                book=book,
+                tablebase=tablebase,
+                ponder=args.ponder,
+            )
+        else:
+            players[colour] = cli.make_player(colour)
+    clock = Clock(60 * args.time, args.increment) if args.time else None
+    journal = None
+    if args.journal:
+        journal = GameJournal(args.journal, flush_every=1, fsync=args.fsync)
+    if journal is not None and journal.plies:
+        chess = ChessGame.resume(
+            players[Colour.WHITE],
+            players[Colour.BLACK],
+            cli,
+            journal,
+            tablebase,
+            clock,
+        )
+    else:
+        board = Board.from_fen(STARTING_FEN)
+        chess = ChessGame(
+            players[Colour.WHITE],
+            players[Colour.BLACK],
+            board,
+            cli,
+            tablebase,
+            journal,
+            clock=clock,
+        )
+    if args.stats:
+        instrumentation.enable()
+    try:
+        if args.profile:
+            with instrumentation.profile(args.profile):
+                chess.play()
+        else:
+            chess.play()
+    finally:
+        if args.stats:
+            instrumentation.write_stats(args.stats)
+        if journal is not None:
+            journal.close()
 
 
 if __name__ == "__main__":